@@ -1,11 +1,11 @@
+import re
 from datetime import datetime
-from pathlib import Path
 
 from playhouse.apsw_ext import BooleanField, DateTimeField, ForeignKeyField
 
 from reprobench.core.base import Step, Observer
 from reprobench.executors.db import BaseModel, Run
-from reprobench.utils import send_event
+from reprobench.utils import search_file, send_event
 
 STORE_SAT_VERDICT = b"satverdict:store"
 
@@ -33,13 +33,14 @@ class SATValidator(Step):
     @classmethod
     def execute(cls, context, config=None):
         tool = context["tool"](context)
-        task = Path(tool.task).read_text()
-        output = tool.get_output().decode()
 
-        satisfiable = "c NOTE: Satisfiable".lower() in task.lower()
+        with open(tool.task, "rb") as task:
+            note = search_file(task, rb"c NOTE: Satisfiable", re.IGNORECASE)
+        satisfiable = note is not None
 
-        is_valid = (satisfiable and "s SATISFIABLE" in output) or (
-            not satisfiable and "s UNSATISFIABLE" in output
+        answer = tool.search_output(rb"^s (UN)?SATISFIABLE", re.MULTILINE)
+        is_valid = (satisfiable and answer == b"s SATISFIABLE") or (
+            not satisfiable and answer == b"s UNSATISFIABLE"
         )
 
         payload = dict(run=context["run"]["id"], is_valid=is_valid)
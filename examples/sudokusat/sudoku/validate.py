@@ -97,7 +97,9 @@ class SudokuValidator(Step):
     def execute(cls, context, config=None):
         tool = context["tool"](context)
         task = cls._filter_empty_lines(Path(tool.task).read_text().split("\n"))
-        output = cls._filter_empty_lines(tool.get_output().decode().split("\n"))
+        output = cls._filter_empty_lines(
+            line.decode().rstrip("\n") for line in tool.iter_output_lines()
+        )
 
         is_valid = True
 
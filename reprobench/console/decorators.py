@@ -69,3 +69,31 @@ def use_tunneling(func):
         return func(tunneling=None, *args, **kwargs)
 
     return wrapper
+
+
+def worker_options(func):
+    """Options of the workers, passed on to them by the managers"""
+
+    @click.option(
+        "--profile-dir",
+        type=click.Path(file_okay=False),
+        default=None,
+        help="Dump a cProfile profile of the selected runs to this directory",
+    )
+    @click.option(
+        "--profile-runs",
+        default="*",
+        show_default=True,
+        help="Glob pattern selecting the run ids to profile",
+    )
+    @click.option(
+        "--cache-dir",
+        type=click.Path(file_okay=False),
+        default=None,
+        help="Persist tool versions per node in this directory",
+    )
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return wrapper
@@ -1,36 +1,262 @@
 import time
+from collections import OrderedDict
+from datetime import timedelta
 
 import click
 from tqdm import tqdm
 
-from reprobench.utils import init_db
+from reprobench.console.decorators import server_info, use_tunneling
+from reprobench.core.events import MANAGER_SUBSCRIBE, RUN_STATS
+from reprobench.core.tunnel import open_tunnel
+from reprobench.utils import decode_message, init_db, send_event
+
+try:
+    import zmq
+except ImportError:
+    zmq = None
 
 try:
     from reprobench.core.db import Run
 except ImportError:
     Run = None
 
+POLL_INTERVAL = 1000
+
+
+class GroupProgress:
+    """Counters of the runs of a tool or parameter group"""
+
+    def __init__(self):
+        self.remaining = 0
+        self.done = 0
+        self.active = 0
+        self.verdicts = {}
+        self.seconds = 0.0
+        self.timed = 0
+
+    def add(self, stats):
+        self.remaining += stats["pending"] + stats["active"]
+        self.done += stats["done"]
+        self.active += stats["active"]
+        for verdict, count in stats["verdicts"].items():
+            self.verdicts[verdict] = self.verdicts.get(verdict, 0) + count
+        self.seconds += stats["seconds"]
+        self.timed += stats["timed"]
+
+    def finish(self, message):
+        self.remaining = max(self.remaining - 1, 0)
+        self.done += 1
+        if message["verdict"] is not None:
+            verdict = message["verdict"]
+            self.verdicts[verdict] = self.verdicts.get(verdict, 0) + 1
+        if message["seconds"] is not None:
+            self.seconds += message["seconds"]
+            self.timed += 1
+
+    @property
+    def total(self):
+        return self.done + self.remaining
+
+    @property
+    def mean_duration(self):
+        return self.seconds / self.timed if self.timed > 0 else None
+
+
+class StatusBoard:
+    """Live progress of a benchmark from the notifications of the server
+
+    The counters are loaded from a snapshot of the server (`RUN_STATS`) and
+    updated incrementally as runs finish. The ETA is the expected duration
+    of the remaining runs, from the mean duration of the finished runs of
+    their group, spread over the runs active at the last snapshot.
+
+    Args:
+        by (str, optional): "tool" or "group". Defaults to "group".
+    """
+
+    def __init__(self, by="group"):
+        self.by = by
+        self.groups = OrderedDict()
+        self.bars = {}
+        self.overall = tqdm(
+            desc="Total",
+            position=0,
+            bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}{postfix}]",
+        )
+        self.start = time.monotonic()
+        self.finished = 0
+        self.concurrency = 1
+
+    def get_key(self, tool, group):
+        return tool if self.by == "tool" else f"{tool}/{group}"
+
+    def load(self, snapshot):
+        self.groups = OrderedDict()
+        for stats in sorted(snapshot, key=lambda s: (s["tool"], s["group"])):
+            key = self.get_key(stats["tool"], stats["group"])
+            self.groups.setdefault(key, GroupProgress()).add(stats)
+        # the workers take the next run as soon as one finishes
+        self.concurrency = max(sum(p.active for p in self.groups.values()), 1)
+        self.refresh()
+
+    def update(self, message):
+        key = self.get_key(message["tool"], message["group"])
+        self.groups.setdefault(key, GroupProgress()).finish(message)
+        self.finished += 1
+        self.refresh()
+
+    @property
+    def remaining(self):
+        return sum(progress.remaining for progress in self.groups.values())
+
+    def get_eta(self):
+        durations = [p.mean_duration for p in self.groups.values() if p.timed > 0]
+        if len(durations) == 0:
+            return None
+
+        fallback = sum(durations) / len(durations)
+        work = sum(
+            progress.remaining
+            * (progress.mean_duration if progress.timed > 0 else fallback)
+            for progress in self.groups.values()
+        )
+        return work / self.concurrency
+
+    def refresh(self):
+        for i, (key, progress) in enumerate(self.groups.items()):
+            if key not in self.bars:
+                self.bars[key] = tqdm(desc=key, position=i + 1, leave=True)
+            bar = self.bars[key]
+            bar.total = progress.total
+            bar.n = progress.done
+            bar.set_postfix(progress.verdicts, refresh=False)
+            bar.refresh()
+
+        self.overall.total = sum(p.total for p in self.groups.values())
+        self.overall.n = sum(p.done for p in self.groups.values())
+        elapsed = time.monotonic() - self.start
+        postfix = OrderedDict(runs_per_min=f"{60 * self.finished / elapsed:.1f}")
+        eta = self.get_eta()
+        if eta is not None:
+            postfix["eta"] = str(timedelta(seconds=int(eta)))
+        self.overall.set_postfix(postfix, refresh=False)
+        self.overall.refresh()
+
+    def close(self):
+        for bar in self.bars.values():
+            bar.close()
+        self.overall.close()
+
+
+def watch_status(server_address, by="group", refresh=60):
+    """Follow the progress of the benchmark until no runs are left
+
+    Notifications received while a snapshot is requested are already
+    accounted for in the snapshot, as the server handles events in order.
+    """
+    context = zmq.Context()
+    socket = context.socket(zmq.DEALER)
+    socket.connect(server_address)
+
+    board = StatusBoard(by=by)
+    awaiting = False
+    last_request = None
+    try:
+        while True:
+            now = time.monotonic()
+            if last_request is None or now - last_request >= refresh:
+                # subscribing again is harmless and survives server restarts
+                send_event(socket, MANAGER_SUBSCRIBE)
+                send_event(socket, RUN_STATS)
+                awaiting = True
+                last_request = now
+
+            if not socket.poll(POLL_INTERVAL):
+                continue
+
+            message = decode_message(socket.recv())
+            if isinstance(message, list):
+                board.load(message)
+                awaiting = False
+            elif "run_id" in message and not awaiting:
+                board.update(message)
+                if message.get("canceled", 0) > 0:
+                    last_request = None
+
+            if not awaiting and board.remaining == 0:
+                break
+    finally:
+        board.close()
+        socket.close(linger=0)
+
 
 def get_total_count():
-    return Run.select().count()
+    # runs canceled by racing are never processed
+    return Run.select().where(Run.status != Run.CANCELED).count()
 
 
 def get_done_count():
-    return Run.select().where(Run.status == Run.DONE).count()
+    return Run.select().where(Run.status.in_([Run.DONE, Run.FAILED])).count()
 
 
-@click.command("status")
-@click.option("-d", "--database", default="./output/benchmark.db", show_default=True)
-@click.option("-n", "--interval", default=2, show_default=True, type=int)
-def benchmark_status(database, interval):
+def watch_database(database, interval=2):
+    """Follow the number of finished runs by polling the database"""
     init_db(database)
-    total = get_total_count()
-
     last = get_done_count()
-    progress = tqdm(total=total, initial=last)
+    progress = tqdm(total=get_total_count(), initial=last)
 
-    while last < total:
+    while last < progress.total:
         time.sleep(interval)
         current = get_done_count()
+        progress.total = get_total_count()
         progress.update(current - last)
         last = current
+    progress.close()
+
+
+@click.command("status")
+@server_info
+@use_tunneling
+@click.option(
+    "-d",
+    "--database",
+    default=None,
+    help="Poll the number of finished runs from this database instead",
+)
+@click.option(
+    "-n",
+    "--interval",
+    default=2,
+    show_default=True,
+    type=int,
+    help="Seconds between polls of the database",
+)
+@click.option(
+    "--by",
+    type=click.Choice(["tool", "group"]),
+    default="group",
+    show_default=True,
+    help="Break the progress down by tool or parameter group",
+)
+@click.option(
+    "--refresh",
+    default=60,
+    show_default=True,
+    type=int,
+    help="Seconds between full snapshots requested from the server",
+)
+def benchmark_status(server_address, tunneling, database, interval, by, refresh):
+    if database is not None:
+        watch_database(database, interval=interval)
+        return
+
+    server = None
+    if tunneling is not None:
+        server = open_tunnel(tunneling)
+        server_address = f"tcp://127.0.0.1:{server.local_bind_port}"
+
+    try:
+        watch_status(server_address, by=by, refresh=refresh)
+    finally:
+        if server is not None:
+            server.stop()
@@ -1,32 +1,56 @@
+import copy
+
 import click
 from loguru import logger
 from playhouse.apsw_ext import APSWDatabase
 
 from reprobench.console.decorators import common
 from reprobench.core.db import Step, db
+from reprobench.statistics.cache import AnalysisCache, get_watermark
 from reprobench.utils import get_db_path, import_class, init_db, read_config
 
 
 class BenchmarkAnalyzer(object):
-    def __init__(self, output_dir, config, **kwargs):
+    def __init__(self, output_dir, config, force=False, **kwargs):
         self.output_dir = output_dir
         self.config = read_config(config)
         self.db_path = get_db_path(output_dir)
+        self.force = force
         init_db(self.db_path)
 
     def run(self):
         steps = self.config["steps"]["analysis"]
         context = dict(output_dir=self.output_dir, db_path=self.db_path)
+        cache = AnalysisCache(self.output_dir)
         for step in steps:
-            logger.debug(f"Running {step['module']}")
             module = import_class(step["module"])
-            module.execute(context, step["config"])
+            config = step.get("config")
+            inputs = module.get_inputs(config)
+            watermark = get_watermark(inputs) if inputs is not None else None
+            output = module.get_output(config)
+
+            fresh = cache.is_fresh(step["module"], config, watermark, output)
+            if not self.force and fresh:
+                logger.info(f"Skipping {step['module']}, its inputs did not change")
+                continue
+
+            logger.debug(f"Running {step['module']}")
+            # steps may consume their config
+            module.execute(context, copy.deepcopy(config))
+            cache.update(step["module"], config, watermark)
+            cache.save()
 
 
 @click.command(name="analyze")
 @click.option(
     "-d", "--output-dir", type=click.Path(), default="./output", show_default=True
 )
+@click.option(
+    "-f",
+    "--force",
+    is_flag=True,
+    help="Run all steps, even if their inputs did not change",
+)
 @click.argument("config", type=click.Path(), default="./benchmark.yml")
 @common
 def cli(**kwargs):
@@ -1,4 +1,4 @@
-from reprobench.utils import recv_event
+from reprobench.utils import recv_event, search_file, tail_file
 
 try:
     import zmq.green as zmq
@@ -34,10 +34,22 @@ class Observer:
 
 
 class Step:
+    # models the results of an analysis step depend on, None if unknown
+    INPUTS = None
+
     @classmethod
     def register(cls, config=None):
         pass
 
+    @classmethod
+    def get_inputs(cls, config=None):
+        return cls.INPUTS
+
+    @classmethod
+    def get_output(cls, config=None):
+        """Get the output of the step, relative to the output directory"""
+        return (config or {}).get("output")
+
     @classmethod
     def execute(cls, context, config=None):
         pass
@@ -50,6 +62,7 @@ class Tool:
         self.cwd = context["run"]["id"]
         self.parameters = context["run"]["parameters"]
         self.task = context["run"]["task"]
+        self.storage = context.get("storage")
 
     def run(self, executor):
         raise NotImplementedError
@@ -60,6 +73,44 @@ class Tool:
     def get_error(self):
         raise NotImplementedError
 
+    def open_output(self):
+        """Open the run output as a binary file object"""
+        raise NotImplementedError
+
+    def open_error(self):
+        """Open the run error output as a binary file object"""
+        raise NotImplementedError
+
+    def iter_output_lines(self):
+        """Iterate the run output line by line without loading it whole"""
+        with self.open_output() as f:
+            yield from f
+
+    def iter_error_lines(self):
+        """Iterate the run error output line by line without loading it whole"""
+        with self.open_error() as f:
+            yield from f
+
+    def tail_output(self, size=64 * 1024):
+        """Get the last `size` bytes of the run output"""
+        with self.open_output() as f:
+            return tail_file(f, size)
+
+    def tail_error(self, size=64 * 1024):
+        """Get the last `size` bytes of the run error output"""
+        with self.open_error() as f:
+            return tail_file(f, size)
+
+    def search_output(self, pattern, flags=0):
+        """Search the run output for a bytes regex, see `search_file`"""
+        with self.open_output() as f:
+            return search_file(f, pattern, flags)
+
+    def search_error(self, pattern, flags=0):
+        """Search the run error output for a bytes regex, see `search_file`"""
+        with self.open_error() as f:
+            return search_file(f, pattern, flags)
+
     @classmethod
     def setup(cls):
         pass
@@ -0,0 +1,103 @@
+import json
+import os
+import platform
+from pathlib import Path
+
+from loguru import logger
+
+from reprobench.utils import import_class
+
+_caches = {}
+
+
+def get_tool_cache(cache_dir=None):
+    """Get the cache shared by all workers of this process using `cache_dir`"""
+    if cache_dir not in _caches:
+        _caches[cache_dir] = ToolCache(cache_dir)
+    return _caches[cache_dir]
+
+
+class ToolCache:
+    """Cache of imported plugin classes and tool metadata of a worker
+
+    Tool metadata is keyed by the module path of the tool and the mtime of
+    its binary (`path`), so rebuilding a tool invalidates it. Nothing tells
+    when tools without a binary change, so their metadata is not cached.
+    With a `cache_dir`, the versions are also persisted in
+    `<cache_dir>/<hostname>.json` to be shared with later workers of the
+    node.
+
+    Args:
+        cache_dir (str, optional): directory to persist the cache in
+    """
+
+    def __init__(self, cache_dir=None):
+        self.classes = {}
+        self.ready = set()
+        self.versions = {}
+        self.cache_path = None
+
+        if cache_dir is not None:
+            self.cache_path = Path(cache_dir) / f"{platform.node()}.json"
+            self.load()
+
+    def load(self):
+        try:
+            entries = json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            return
+
+        for entry in entries:
+            if entry["mtime"] is not None:
+                key = (entry["module"], entry["mtime"])
+                self.versions[key] = entry["version"]
+
+    def save(self):
+        entries = [
+            dict(module=module, mtime=mtime, version=version)
+            for (module, mtime), version in self.versions.items()
+        ]
+
+        # concurrent workers may overwrite each other, but never leave the
+        # file half written; a lost entry is only computed once more
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.cache_path.with_name(f".{self.cache_path.name}.{os.getpid()}")
+        temp_path.write_text(json.dumps(entries))
+        os.replace(temp_path, self.cache_path)
+
+    def import_class(self, path):
+        if path not in self.classes:
+            self.classes[path] = import_class(path)
+        return self.classes[path]
+
+    @staticmethod
+    def get_key(module, tool):
+        path = getattr(tool, "path", None)
+        try:
+            mtime = os.stat(path).st_mtime_ns if path is not None else None
+        except OSError:
+            mtime = None
+        return (module, mtime)
+
+    def is_ready(self, module, tool):
+        key = self.get_key(module, tool)
+        if key in self.ready:
+            return True
+        ready = tool.is_ready()
+        if ready and key[1] is not None:
+            self.ready.add(key)
+        return ready
+
+    def version(self, module, tool):
+        key = self.get_key(module, tool)
+        if key[1] is None:
+            return tool.version()
+        if key not in self.versions:
+            self.versions[key] = tool.version()
+            if self.cache_path is not None:
+                try:
+                    self.load()
+                    self.save()
+                except OSError as e:
+                    logger.warning(f"Cannot persist tool cache: {e}")
+        return self.versions[key]
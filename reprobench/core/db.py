@@ -6,6 +6,7 @@ from playhouse.apsw_ext import (
     CharField,
     CompositeKey,
     DateTimeField,
+    FloatField,
     ForeignKeyField,
     IntegerField,
     TextField,
@@ -101,4 +102,30 @@ class Run(BaseModel):
     iteration = IntegerField(default=0)
 
 
-MODELS = (Limit, TaskGroup, Task, Tool, ParameterGroup, Parameter, Run, Step, Observer)
+class RunTiming(BaseModel):
+    run = ForeignKeyField(Run, backref="timings", on_delete="cascade")
+    phase = CharField(help_text="Worker phase, or step:<module> for a step")
+    seconds = FloatField(help_text="Wall Clock Time (s)")
+
+    class Meta:
+        primary_key = CompositeKey("run", "phase")
+
+
+class RunJob(BaseModel):
+    run = ForeignKeyField(Run, backref="job", on_delete="cascade", primary_key=True)
+    job_id = CharField(index=True, help_text="Scheduler job id of the last worker")
+
+
+MODELS = (
+    Limit,
+    TaskGroup,
+    Task,
+    Tool,
+    ParameterGroup,
+    Parameter,
+    Run,
+    RunJob,
+    RunTiming,
+    Step,
+    Observer,
+)
@@ -3,7 +3,13 @@ BOOTSTRAP = b"core:bootstrap"
 WORKER_JOIN = b"worker:join"
 WORKER_LEAVE = b"worker:leave"
 
+MANAGER_SUBSCRIBE = b"manager:subscribe"
+
 RUN_START = b"run:start"
 RUN_STEP = b"run:step"
 RUN_INTERRUPT = b"run:interrupt"
 RUN_FINISH = b"run:finish"
+RUN_TIMINGS = b"run:timings"
+RUN_ESTIMATES = b"run:estimates"
+RUN_RECONCILE = b"run:reconcile"
+RUN_STATS = b"run:stats"
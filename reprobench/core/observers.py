@@ -1,23 +1,59 @@
+import time
 from functools import lru_cache
 
-from peewee import fn
+import numpy
+import zmq
+from loguru import logger
+from peewee import DatabaseError, fn
 
 from reprobench.core.base import Observer
 from reprobench.core.bootstrap.server import bootstrap
-from reprobench.core.db import Limit, Run, Step
+from reprobench.core.db import Limit, ParameterGroup, Run, RunJob, RunTiming, Step
 from reprobench.core.events import (
     BOOTSTRAP,
+    MANAGER_SUBSCRIBE,
+    RUN_ESTIMATES,
     RUN_FINISH,
     RUN_INTERRUPT,
+    RUN_RECONCILE,
     RUN_START,
+    RUN_STATS,
     RUN_STEP,
+    RUN_TIMINGS,
     WORKER_JOIN,
 )
+from reprobench.core.racing import Race
+from reprobench.core.scheduling import FIFO, RunQueue
+from reprobench.executors.db import RunStatistic
+from reprobench.executors.events import STORE_RUNSTATS
 from reprobench.utils import encode_message
 
 
 class CoreObserver(Observer):
-    SUBSCRIBED_EVENTS = (BOOTSTRAP, WORKER_JOIN, RUN_START, RUN_STEP, RUN_FINISH)
+    SUBSCRIBED_EVENTS = (
+        BOOTSTRAP,
+        WORKER_JOIN,
+        RUN_START,
+        RUN_STEP,
+        RUN_INTERRUPT,
+        RUN_FINISH,
+        RUN_TIMINGS,
+        RUN_ESTIMATES,
+        RUN_RECONCILE,
+        RUN_STATS,
+        MANAGER_SUBSCRIBE,
+        STORE_RUNSTATS,
+    )
+    MEMORY_PEAK_TTL = 60
+
+    memory_peaks = {}
+    subscribers = set()
+    verdicts = {}
+    run_queue = RunQueue()
+    race = None
+    capping = None
+    output_dir = None
+    interrupted = 0
 
     @classmethod
     @lru_cache(maxsize=1)
@@ -25,12 +61,70 @@ class CoreObserver(Observer):
         return {l.key: l.value for l in Limit.select()}
 
     @classmethod
-    def get_next_pending_run(cls):
+    def get_memory_peak(cls, parameter_group_id):
+        """Get the largest memory usage (KiB) observed for a parameter group"""
+        now = time.monotonic()
+        cached = cls.memory_peaks.get(parameter_group_id)
+        if cached is not None and now - cached[0] < cls.MEMORY_PEAK_TTL:
+            return cached[1]
+
+        try:
+            peak = (
+                RunStatistic.select(fn.MAX(RunStatistic.max_memory))
+                .join(Run)
+                .where(Run.parameter_group == parameter_group_id)
+                .scalar()
+            )
+        except DatabaseError:
+            # no executor has registered the statistics table
+            peak = None
+
+        cls.memory_peaks[parameter_group_id] = (now, peak)
+        return peak
+
+    @classmethod
+    def get_time_cap(cls, task, time_limit):
+        """Get the capped time limit of the runs of a task
+
+        With adaptive capping, the time limit of a run is lowered to `factor`
+        times the lowest CPU time of the successful runs on the same task,
+        but not below `minimum`.
+
+        Returns:
+            float: the capped time limit (s), or None if the time limit
+            is not lowered
+        """
+        if cls.capping is None:
+            return None
+
         try:
-            run = Run.select().where(Run.status == Run.PENDING).limit(1).get()
-        except Run.DoesNotExist:
+            best = (
+                RunStatistic.select(fn.MIN(RunStatistic.cpu_time))
+                .join(Run)
+                .where(
+                    (Run.task == task) & (RunStatistic.verdict == RunStatistic.SUCCESS)
+                )
+                .scalar()
+            )
+        except DatabaseError:
+            # no executor has registered the statistics table
+            best = None
+
+        if best is None:
             return None
 
+        time_cap = max(cls.capping["factor"] * best, cls.capping["minimum"])
+        return time_cap if time_cap < time_limit else None
+
+    @classmethod
+    def get_next_pending_run(cls):
+        run = cls.run_queue.pop()
+        if run is None:
+            try:
+                run = Run.select().where(Run.status == Run.PENDING).limit(1).get()
+            except Run.DoesNotExist:
+                return None
+
         run.status = Run.SUBMITTED
         run.save()
 
@@ -40,6 +134,9 @@ class CoreObserver(Observer):
             (Step.category == Step.RUN) & (Step.id > last_step)
         )
         limits = cls.get_limits()
+        time_cap = cls.get_time_cap(run.task_id, float(limits["time"]))
+        if time_cap is not None:
+            limits = dict(limits, time=time_cap)
         parameters = {p.key: p.value for p in run.parameter_group.parameters}
 
         run_dict = dict(
@@ -49,6 +146,9 @@ class CoreObserver(Observer):
             parameters=parameters,
             steps=list(runsteps.dicts()),
             limits=limits,
+            memory_peak=cls.get_memory_peak(run.parameter_group_id),
+            capped=time_cap is not None,
+            output_dir=cls.output_dir,
         )
 
         return run_dict
@@ -59,11 +159,219 @@ class CoreObserver(Observer):
             Step.select(fn.MAX(Step.id)).where(Step.category == Step.RUN).scalar()
         )
         Run.update(status=Run.PENDING).where(
-            (Run.status < Run.DONE) | (Run.last_step_id != last_step)
+            (Run.status != Run.CANCELED)
+            & ((Run.status < Run.DONE) | (Run.last_step_id != last_step))
         ).execute()
         pending_runs = Run.select(Run.id).where(Run.status == Run.PENDING).count()
         return pending_runs
 
+    @staticmethod
+    def get_race(config, time_limit):
+        if config is None:
+            return None
+        if not Race.is_available():
+            logger.error("Racing requires scipy, running all parameter groups")
+            return None
+        return Race(time_limit, **config)
+
+    @classmethod
+    def get_run_estimates(cls, quantile):
+        """Estimate the resource usage of the pending runs of each tool
+
+        Returns:
+            dict: for each tool with pending runs, the number of `pending`
+            runs, the number of finished runs (`samples`) and the `quantile`
+            of their `wall_time` (s), or None without samples
+        """
+        pending = (
+            Run.select(Run.tool, fn.COUNT(Run.id))
+            .where(Run.status == Run.PENDING)
+            .group_by(Run.tool)
+            .tuples()
+        )
+
+        estimates = {}
+        for tool, count in pending:
+            try:
+                wall_times = [
+                    wall_time
+                    for (wall_time,) in RunStatistic.select(RunStatistic.wall_time)
+                    .join(Run)
+                    .where(Run.tool == tool)
+                    .tuples()
+                ]
+            except DatabaseError:
+                wall_times = []
+
+            values = [value for value in wall_times if value is not None]
+            estimates[tool] = dict(
+                pending=count,
+                samples=len(wall_times),
+                wall_time=float(numpy.quantile(values, quantile)) if values else None,
+            )
+
+        return estimates
+
+    @classmethod
+    def reconcile_runs(cls, jobs, orphans=False):
+        """Reset the unfinished runs of jobs that are gone
+
+        Args:
+            jobs (list): ids of the jobs that are no longer running
+            orphans (bool, optional): reset all unfinished runs, for when no
+                job is left at all. Defaults to False.
+
+        Returns:
+            dict: number of runs `reset`, of runs handed back by their worker
+            since the last call (`interrupted`), and of `pending`, `active`
+            (submitted or running), `done` and `total` runs afterwards
+        """
+        active = Run.status.in_((Run.SUBMITTED, Run.RUNNING))
+        if not orphans:
+            job_runs = RunJob.select(RunJob.run).where(RunJob.job_id.in_(jobs))
+            active &= Run.id.in_(job_runs)
+        reset = Run.update(status=Run.PENDING).where(active).execute()
+        interrupted, cls.interrupted = cls.interrupted, 0
+        return dict(reset=reset, interrupted=interrupted, **cls.get_run_counts())
+
+    @classmethod
+    def get_run_counts(cls):
+        counts = dict(
+            Run.select(Run.status, fn.COUNT(Run.id)).group_by(Run.status).tuples()
+        )
+        return dict(
+            pending=counts.get(Run.PENDING, 0),
+            active=counts.get(Run.SUBMITTED, 0) + counts.get(Run.RUNNING, 0),
+            done=counts.get(Run.DONE, 0),
+            canceled=counts.get(Run.CANCELED, 0),
+            total=sum(counts.values()) - counts.get(Run.CANCELED, 0),
+        )
+
+    @classmethod
+    def get_run_stats(cls):
+        """Get the progress of each parameter group
+
+        Returns:
+            list: for each tool and parameter group, the number of `pending`,
+            `active`, `done`, `canceled` and `failed` runs, the number of
+            runs of each verdict (`verdicts`), and the total duration
+            (`seconds`) of the `timed` runs the worker reported timings of
+        """
+        statuses = {
+            Run.PENDING: "pending",
+            Run.SUBMITTED: "active",
+            Run.RUNNING: "active",
+            Run.DONE: "done",
+            Run.CANCELED: "canceled",
+            Run.FAILED: "failed",
+        }
+        groups = {}
+
+        def get_group(tool, group):
+            if (tool, group) not in groups:
+                groups[(tool, group)] = dict(
+                    tool=tool,
+                    group=group,
+                    verdicts={},
+                    seconds=0.0,
+                    timed=0,
+                    **{status: 0 for status in statuses.values()},
+                )
+            return groups[(tool, group)]
+
+        counts = (
+            Run.select(Run.tool, ParameterGroup.name, Run.status, fn.COUNT(Run.id))
+            .join(ParameterGroup)
+            .group_by(Run.tool, ParameterGroup.name, Run.status)
+            .tuples()
+        )
+        for tool, group, status, count in counts:
+            get_group(tool, group)[statuses[status]] += count
+
+        durations = (
+            RunTiming.select(
+                Run.tool, ParameterGroup.name, fn.SUM(RunTiming.seconds), fn.COUNT()
+            )
+            .join(Run)
+            .join(ParameterGroup)
+            .where(RunTiming.phase == "total")
+            .group_by(Run.tool, ParameterGroup.name)
+            .tuples()
+        )
+        for tool, group, seconds, count in durations:
+            get_group(tool, group).update(seconds=seconds, timed=count)
+
+        try:
+            verdicts = list(
+                RunStatistic.select(
+                    Run.tool, ParameterGroup.name, RunStatistic.verdict, fn.COUNT()
+                )
+                .join(Run)
+                .join(ParameterGroup)
+                .group_by(Run.tool, ParameterGroup.name, RunStatistic.verdict)
+                .tuples()
+            )
+        except DatabaseError:
+            # no executor has registered the statistics table
+            verdicts = []
+        for tool, group, verdict, count in verdicts:
+            get_group(tool, group)["verdicts"][verdict] = count
+
+        return list(groups.values())
+
+    @classmethod
+    def get_finish_message(cls, run_id):
+        """Describe a finished run to the subscribers"""
+        tool, group = (
+            Run.select(Run.tool, ParameterGroup.name)
+            .join(ParameterGroup)
+            .where(Run.id == run_id)
+            .tuples()
+            .get()
+        )
+        seconds = (
+            RunTiming.select(RunTiming.seconds)
+            .where((RunTiming.run == run_id) & (RunTiming.phase == "total"))
+            .scalar()
+        )
+        return dict(
+            run_id=run_id,
+            tool=tool,
+            group=group,
+            verdict=cls.verdicts.pop(run_id, None),
+            seconds=seconds,
+        )
+
+    @classmethod
+    def notify_subscribers(cls, reply, message):
+        """Send `message` to the subscribers, dropping the unreachable ones
+
+        A subscriber which disconnected, or which stopped reading and filled
+        its queue, is dropped instead of having its messages queued forever.
+        It may subscribe again.
+        """
+        encoded = encode_message(message)
+        # report unknown peers instead of silently discarding their messages
+        reply.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        try:
+            for address in list(cls.subscribers):
+                try:
+                    reply.send_multipart([address, encoded], flags=zmq.NOBLOCK)
+                except zmq.ZMQError as e:
+                    logger.info(f"Dropping subscriber {address}: {e}")
+                    cls.subscribers.discard(address)
+        finally:
+            reply.setsockopt(zmq.ROUTER_MANDATORY, 0)
+
+    @staticmethod
+    def store_timings(run_id, timings):
+        rows = [
+            dict(run=run_id, phase=phase, seconds=seconds)
+            for phase, seconds in timings.items()
+        ]
+        if len(rows) > 0:
+            RunTiming.insert_many(rows).on_conflict("replace").execute()
+
     @classmethod
     def handle_event(cls, event_type, payload, **kwargs):
         reply = kwargs.pop("reply")
@@ -72,18 +380,65 @@ class CoreObserver(Observer):
 
         if event_type == BOOTSTRAP:
             bootstrap(observe_args=observe_args, **payload)
+            cls.output_dir = payload["output_dir"]
             pending_runs = cls.get_pending_runs()
+            scheduling = payload["config"].get("scheduling", {})
+            time_limit = float(payload["config"]["limits"]["time"])
+            cls.race = cls.get_race(scheduling.get("racing"), time_limit)
+            cls.capping = scheduling.get("capping")
+            task_ranks = cls.race.get_task_ranks() if cls.race else None
+            cls.run_queue = RunQueue(scheduling.get("order", FIFO))
+            cls.run_queue.fill(time_limit, task_ranks=task_ranks)
             reply.send_multipart([address, encode_message(pending_runs)])
         elif event_type == WORKER_JOIN:
             run = cls.get_next_pending_run()
             reply.send_multipart([address, encode_message(run)])
+        elif event_type == RUN_ESTIMATES:
+            estimates = cls.get_run_estimates(payload["quantile"])
+            reply.send_multipart([address, encode_message(estimates)])
+        elif event_type == MANAGER_SUBSCRIBE:
+            cls.subscribers.add(address)
+            reply.send_multipart([address, encode_message(cls.get_run_counts())])
+        elif event_type == RUN_STATS:
+            reply.send_multipart([address, encode_message(cls.get_run_stats())])
+        elif event_type == STORE_RUNSTATS:
+            # the verdict is reported to the subscribers once the run finishes
+            cls.verdicts[payload["run_id"]] = payload["verdict"]
+            if cls.race is not None:
+                cls.race.record(payload)
+        elif event_type == RUN_RECONCILE:
+            result = cls.reconcile_runs(**payload)
+            reply.send_multipart([address, encode_message(result)])
         elif event_type == RUN_INTERRUPT:
+            cls.interrupted += 1
+            cls.verdicts.pop(payload, None)
             Run.update(status=Run.PENDING).where(Run.id == payload).execute()
         elif event_type == RUN_START:
             run_id = payload.pop("run_id")
+            job_id = payload.pop("job_id", None)
             Run.update(status=Run.RUNNING, **payload).where(Run.id == run_id).execute()
+            if job_id is not None:
+                query = RunJob.insert(run=run_id, job_id=job_id)
+                query.on_conflict("replace").execute()
         elif event_type == RUN_STEP:
             step = Step.get(module=payload["step"])
             Run.update(last_step=step).where(Run.id == payload["run_id"]).execute()
+            if "time" in payload:
+                phase = f"step:{payload['step']}"
+                cls.store_timings(payload["run_id"], {phase: payload["time"]})
+        elif event_type == RUN_TIMINGS:
+            cls.store_timings(payload["run_id"], payload["timings"])
         elif event_type == RUN_FINISH:
-            Run.update(status=Run.DONE).where(Run.id == payload).execute()
+            run_id = payload
+            if isinstance(payload, dict):
+                # workers that sent their timings along with the run id
+                run_id = payload["run_id"]
+                cls.store_timings(run_id, payload.get("timings", {}))
+            Run.update(status=Run.DONE).where(Run.id == run_id).execute()
+            canceled = cls.race.update(run_id) if cls.race is not None else 0
+            if len(cls.subscribers) > 0:
+                message = cls.get_finish_message(run_id)
+                message["canceled"] = canceled
+                cls.notify_subscribers(reply, message)
+            else:
+                cls.verdicts.pop(run_id, None)
@@ -0,0 +1,258 @@
+import math
+import random
+
+import numpy
+from loguru import logger
+from peewee import JOIN, DatabaseError
+
+from reprobench.core.db import ParameterGroup, Run, Task
+from reprobench.executors.db import RunStatistic
+
+try:
+    from scipy import stats
+except ImportError:
+    stats = None
+
+
+def race_step(costs, alpha):
+    """Find the configurations that are not significantly worse than the best
+
+    The configurations are compared with the Friedman test over the tasks,
+    followed by the Conover post-hoc test against the best one when the
+    null hypothesis is rejected. Two configurations are compared with the
+    Wilcoxon signed-rank test instead.
+
+    Args:
+        costs (numpy.ndarray): (tasks, configurations) array of costs
+        alpha (float): significance level of the tests
+
+    Returns:
+        [int]: indices of the surviving configurations
+    """
+    n, k = costs.shape
+    survivors = list(range(k))
+    if n < 2 or k < 2:
+        return survivors
+
+    ranks = numpy.apply_along_axis(stats.rankdata, 1, costs)
+    rank_sums = ranks.sum(axis=0)
+    best = int(numpy.argmin(rank_sums))
+
+    if k == 2:
+        if not numpy.any(costs[:, 0] != costs[:, 1]):
+            return survivors
+        if stats.wilcoxon(costs[:, 0], costs[:, 1]).pvalue >= alpha:
+            return survivors
+        return [best]
+
+    squares = (ranks ** 2).sum()
+    ties = n * k * (k + 1) ** 2 / 4
+    if squares <= ties:
+        # every configuration tied on every task
+        return survivors
+
+    statistic = (k - 1) * ((rank_sums - n * (k + 1) / 2) ** 2).sum() / (squares - ties)
+    if statistic <= stats.chi2.ppf(1 - alpha, k - 1):
+        return survivors
+
+    df = (n - 1) * (k - 1)
+    spread = math.sqrt(2 * (n * squares - (rank_sums ** 2).sum()) / df)
+    threshold = stats.t.ppf(1 - alpha / 2, df) * spread
+    return [j for j in survivors if rank_sums[j] - rank_sums[best] <= threshold]
+
+
+class Race:
+    """Racing of the parameter groups of each tool, as in F-race
+
+    The runs are dispatched task by task in a shuffled order, so that all
+    parameter groups of a tool are evaluated on the same tasks first. Once
+    a task is finished by all remaining groups of a tool, and at least
+    `min_tasks` tasks are, the groups are compared on the penalized wall
+    time of their runs (`penalty` times the time limit for unsuccessful
+    runs). Runs stopped by adaptive capping (CAP) cost the time they were
+    stopped at, a lower bound of their runtime which already exceeds the
+    best run of the task. The pending runs of the groups found worse than
+    the best one are canceled.
+
+    The statistics of a run may reach the database after the run finished,
+    so they are also recorded from the events with `record`. The costs of a
+    task are read once, when it is finished, and kept for the next tests.
+
+    Args:
+        time_limit (float): the time limit of the runs
+        min_tasks (int, optional): tasks before the first test. Defaults to 5.
+        alpha (float, optional): significance level. Defaults to 0.05.
+        penalty (int, optional): penalty factor of unsolved runs. Defaults to 10.
+        seed (int, optional): seed of the task order. Defaults to 0.
+    """
+
+    def __init__(self, time_limit, min_tasks=5, alpha=0.05, penalty=10, seed=0):
+        self.time_limit = time_limit
+        self.min_tasks = max(min_tasks, 2)
+        self.alpha = alpha
+        self.penalty = penalty
+        self.seed = seed
+        self.statistics = {}
+        # mean cost of each group on the finished tasks of each tool
+        self.costs = {}
+
+        eliminated = (
+            Run.select(Run.parameter_group)
+            .where(Run.status == Run.CANCELED)
+            .distinct()
+            .tuples()
+        )
+        self.eliminated = {group for (group,) in eliminated}
+
+    @staticmethod
+    def is_available():
+        return stats is not None
+
+    def get_task_ranks(self):
+        """Get the position of each task in the dispatch order"""
+        tasks = [
+            task for (task,) in Task.select(Task.path).order_by(Task.path).tuples()
+        ]
+        random.Random(self.seed).shuffle(tasks)
+        return {task: rank for rank, task in enumerate(tasks)}
+
+    def record(self, statistics):
+        """Keep the verdict and wall time of a run until they are stored"""
+        self.statistics[statistics["run_id"]] = (
+            statistics["verdict"],
+            statistics["wall_time"],
+        )
+
+    def get_cost(self, verdict, wall_time):
+        if wall_time is not None and verdict in (
+            RunStatistic.SUCCESS,
+            RunStatistic.CAPPED,
+        ):
+            return wall_time
+        return self.penalty * self.time_limit
+
+    def get_alive_groups(self, tool):
+        groups = ParameterGroup.select(ParameterGroup.id, ParameterGroup.name).where(
+            ParameterGroup.tool == tool
+        )
+        return {
+            group: name
+            for group, name in groups.tuples()
+            if group not in self.eliminated
+        }
+
+    def is_task_finished(self, tool, task, groups):
+        unfinished = Run.select().where(
+            (Run.tool == tool)
+            & (Run.task == task)
+            & Run.parameter_group.in_(list(groups))
+            & Run.status.in_((Run.PENDING, Run.SUBMITTED, Run.RUNNING))
+        )
+        return not unfinished.exists()
+
+    def read_costs(self, tool, groups, task=None):
+        """Read the mean cost of each group on the tasks of its done runs
+
+        Args:
+            task (str, optional): only read the runs of this task
+
+        Returns:
+            dict: the costs by group of each task
+        """
+        where = (
+            (Run.tool == tool)
+            & (Run.status == Run.DONE)
+            & Run.parameter_group.in_(groups)
+        )
+        if task is not None:
+            where &= Run.task == task
+        try:
+            rows = (
+                Run.select(
+                    Run.id,
+                    Run.parameter_group,
+                    Run.task,
+                    RunStatistic.verdict,
+                    RunStatistic.wall_time,
+                )
+                .join(RunStatistic, JOIN.LEFT_OUTER)
+                .where(where)
+                .tuples()
+            )
+            rows = list(rows)
+        except DatabaseError:
+            # no executor has registered the statistics table
+            return {}
+
+        costs = {}
+        for run_id, group, task, verdict, wall_time in rows:
+            recorded = self.statistics.pop(run_id, None)
+            if verdict is None and recorded is not None:
+                # not stored yet
+                verdict, wall_time = recorded
+            cost = self.get_cost(verdict, wall_time)
+            costs.setdefault(task, {}).setdefault(group, []).append(cost)
+
+        return {
+            task: {group: numpy.mean(values) for group, values in by_group.items()}
+            for task, by_group in costs.items()
+        }
+
+    def get_costs(self, tool, groups, task):
+        """Get the mean cost of each group on the tasks finished by all groups
+
+        The tasks finished before are only read on the first test of the
+        tool, then only the task just finished is.
+
+        Returns:
+            numpy.ndarray: (tasks, groups) array of costs
+        """
+        if tool not in self.costs:
+            self.costs[tool] = self.read_costs(tool, groups)
+        else:
+            self.costs[tool].update(self.read_costs(tool, groups, task))
+
+        blocks = [
+            [by_group[group] for group in groups]
+            for by_group in self.costs[tool].values()
+            if all(group in by_group for group in groups)
+        ]
+        return numpy.array(blocks).reshape(-1, len(groups))
+
+    def update(self, run_id):
+        """Test the groups of the tool of a finished run
+
+        Returns:
+            int: the number of runs canceled
+        """
+        run = Run.get_or_none(Run.id == run_id)
+        if run is None or run.parameter_group_id in self.eliminated:
+            self.statistics.pop(run_id, None)
+            return 0
+
+        groups = self.get_alive_groups(run.tool_id)
+        if len(groups) < 2:
+            self.statistics.pop(run_id, None)
+            return 0
+        if not self.is_task_finished(run.tool_id, run.task_id, groups):
+            return 0
+
+        ids = list(groups)
+        costs = self.get_costs(run.tool_id, ids, run.task_id)
+        if len(costs) < self.min_tasks:
+            return 0
+
+        survivors = race_step(costs, self.alpha)
+        eliminated = [group for i, group in enumerate(ids) if i not in survivors]
+        if len(eliminated) == 0:
+            return 0
+
+        self.eliminated.update(eliminated)
+        names = ", ".join(groups[group] for group in eliminated)
+        logger.info(f"Eliminated {names} of {run.tool_id} after {len(costs)} tasks")
+
+        return (
+            Run.update(status=Run.CANCELED)
+            .where(Run.parameter_group.in_(eliminated) & (Run.status == Run.PENDING))
+            .execute()
+        )
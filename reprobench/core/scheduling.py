@@ -0,0 +1,143 @@
+import heapq
+import os
+from collections import defaultdict
+
+from peewee import DatabaseError
+
+from reprobench.core.db import Run, Task
+from reprobench.executors.db import RunStatistic
+
+FIFO = "fifo"
+LPT = "lpt"
+ORDERS = (FIFO, LPT)
+
+
+def _get_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+def estimate_runtimes(runs, time_limit):
+    """Estimate the wall time of runs from the finished ones
+
+    In order of preference, the estimate of a run is the mean wall time of
+    the runs of the same tool on the same task, the mean wall time of the
+    tool on the task group scaled by the size of the task relative to the
+    tasks of that group, or the time limit scaled by the size of the task
+    relative to the largest task.
+
+    Args:
+        runs (list): (run id, tool, task path, task group) of the runs
+        time_limit (float): the time limit of the runs
+
+    Returns:
+        dict: the estimated wall time of each run id
+    """
+    try:
+        finished = list(
+            RunStatistic.select(Run.tool, Run.task, Task.group, RunStatistic.wall_time)
+            .join(Run)
+            .join(Task)
+            .where(RunStatistic.wall_time.is_null(False))
+            .tuples()
+        )
+    except DatabaseError:
+        # no executor has registered the statistics table
+        finished = []
+
+    sizes = {}
+    by_task = defaultdict(list)
+    by_group = defaultdict(list)
+    group_sizes = defaultdict(list)
+    for tool, task, group, wall_time in finished:
+        by_task[(tool, task)].append(wall_time)
+        by_group[(tool, group)].append(wall_time)
+        if task not in sizes:
+            sizes[task] = _get_size(task)
+        if sizes[task] is not None:
+            group_sizes[(tool, group)].append(sizes[task])
+
+    for _, _, task, _ in runs:
+        if task not in sizes:
+            sizes[task] = _get_size(task)
+    max_size = max((size for size in sizes.values() if size), default=None)
+
+    estimates = {}
+    for run_id, tool, task, group in runs:
+        size = sizes[task]
+        if (tool, task) in by_task:
+            estimate = _mean(by_task[(tool, task)])
+        elif (tool, group) in by_group:
+            estimate = _mean(by_group[(tool, group)])
+            mean_size = _mean(group_sizes[(tool, group)] or [0])
+            if size is not None and mean_size > 0:
+                estimate *= size / mean_size
+            estimate = min(estimate, time_limit)
+        elif size is not None and max_size:
+            estimate = time_limit * size / max_size
+        else:
+            estimate = time_limit
+        estimates[run_id] = estimate
+
+    return estimates
+
+
+class RunQueue:
+    """Pending runs in the order they should be dispatched
+
+    Runs are taken longest expected first (LPT), so that the long runs do not
+    end up alone at the end of the campaign. When racing, the runs are taken
+    task by task in the order of the race, and by LPT or table order within
+    a task. Runs becoming pending again after being taken are not part of
+    the queue anymore, they are served by the caller once the queue is empty.
+    """
+
+    def __init__(self, order=FIFO):
+        self.order = order
+        self.heap = []
+
+    def fill(self, time_limit, task_ranks=None):
+        """Order the currently pending runs
+
+        Args:
+            time_limit (float): the time limit of the runs
+            task_ranks (dict, optional): position of each task in the order
+                of a race
+        """
+        self.heap = []
+        if self.order != LPT and task_ranks is None:
+            return
+
+        runs = list(
+            Run.select(Run.id, Run.tool, Run.task, Task.group)
+            .join(Task)
+            .where(Run.status == Run.PENDING)
+            .tuples()
+        )
+        estimates = {}
+        if self.order == LPT:
+            estimates = estimate_runtimes(runs, time_limit)
+
+        for index, (run_id, _, task, _) in enumerate(runs):
+            rank = task_ranks.get(task, 0) if task_ranks is not None else 0
+            self.heap.append((rank, -estimates.get(run_id, 0), index, run_id))
+        heapq.heapify(self.heap)
+
+    def pop(self):
+        """Take the next run that is still pending
+
+        Returns:
+            Run: the run, or None when the queue is exhausted
+        """
+        while len(self.heap) > 0:
+            *_, run_id = heapq.heappop(self.heap)
+            run = Run.get_or_none((Run.id == run_id) & (Run.status == Run.PENDING))
+            if run is not None:
+                return run
+        return None
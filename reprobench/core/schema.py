@@ -1,4 +1,4 @@
-from strictyaml import Any, Enum, Int, Map, MapPattern, Optional, Regex, Seq, Str
+from strictyaml import Any, Enum, Float, Int, Map, MapPattern, Optional, Regex, Seq, Str
 
 limits_schema = Map(
     {
@@ -17,11 +17,36 @@ plugin_schema = Map(
 
 task_sources = Enum(["local", "url"])
 
+racing_schema = Map(
+    {
+        Optional("min_tasks", default=5): Int(),
+        Optional("alpha", default=0.05): Float(),
+        Optional("penalty", default=10): Int(),
+        Optional("seed", default=0): Int(),
+    }
+)
+
+capping_schema = Map(
+    {
+        Optional("factor", default=2.0): Float(),
+        Optional("minimum", default=1.0): Float(),
+    }
+)
+
+scheduling_schema = Map(
+    {
+        Optional("order", default="fifo"): Enum(["fifo", "lpt"]),
+        Optional("racing"): racing_schema,
+        Optional("capping"): capping_schema,
+    }
+)
+
 schema = Map(
     {
         "title": Str(),
         Optional("description"): Str(),
         "limits": limits_schema,
+        Optional("scheduling"): scheduling_schema,
         "steps": Map(
             {"run": Seq(plugin_schema), Optional("analysis"): Seq(plugin_schema)}
         ),
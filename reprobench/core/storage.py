@@ -0,0 +1,179 @@
+import fcntl
+import io
+import platform
+import shutil
+from pathlib import Path
+
+from reprobench.utils import decompress_stream
+
+PACK_DIR = "packs"
+
+
+class PackSlice(io.RawIOBase):
+    """Read-only view of a byte range of a file"""
+
+    def __init__(self, f, offset, length):
+        self.f = f
+        self.offset = offset
+        self.length = length
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, position, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            position += self.position
+        elif whence == io.SEEK_END:
+            position += self.length
+        self.position = min(max(position, 0), self.length)
+        return self.position
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.length - self.position)
+        if size <= 0:
+            return 0
+        self.f.seek(self.offset + self.position)
+        read = self.f.readinto(memoryview(buffer)[:size])
+        self.position += read
+        return read
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+
+class PackStore:
+    """Run outputs appended into sharded pack files
+
+    A shard consists of `<shard>.pack`, holding the concatenated outputs,
+    and `<shard>.idx`, a text file with one `run_id, stream, offset, length,
+    compression` line per stored output. Both are only appended to while
+    holding an exclusive lock on the index, so a shard can be shared by all
+    workers of a node. Later entries for the same run and stream win.
+
+    Args:
+        root (str): directory of the pack files
+        shard (str, optional): shard to write to. Defaults to the hostname.
+    """
+
+    PACK_SUFFIX = ".pack"
+    INDEX_SUFFIX = ".idx"
+    COPY_BUFFER = 1024 * 1024
+
+    def __init__(self, root, shard=None):
+        self.root = Path(root)
+        self.shard = shard or platform.node()
+        self.index = {}
+        self.index_offsets = {}
+
+    def get_pack_path(self, shard):
+        return self.root / f"{shard}{self.PACK_SUFFIX}"
+
+    def get_index_path(self, shard):
+        return self.root / f"{shard}{self.INDEX_SUFFIX}"
+
+    def append(self, run_id, streams, compression=None):
+        """Append the outputs of a run to the shard of this store
+
+        Args:
+            run_id (str): the run id
+            streams (dict): mapping of stream name to the path of its content
+            compression (str, optional): compression of the contents
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        index_path = self.get_index_path(self.shard)
+        pack_path = self.get_pack_path(self.shard)
+
+        with open(index_path, "ab") as index, open(pack_path, "ab") as pack:
+            fcntl.flock(index, fcntl.LOCK_EX)
+            try:
+                offset = pack.seek(0, io.SEEK_END)
+                lines = []
+                for stream, path in streams.items():
+                    with open(path, "rb") as f:
+                        shutil.copyfileobj(f, pack, self.COPY_BUFFER)
+                    length = pack.tell() - offset
+                    lines.append(
+                        f"{run_id}\t{stream}\t{offset}\t{length}\t{compression or ''}\n"
+                    )
+                    self.index[(run_id, stream)] = (
+                        self.shard,
+                        offset,
+                        length,
+                        compression,
+                    )
+                    offset += length
+                pack.flush()
+                index.write("".join(lines).encode())
+                index.flush()
+            finally:
+                fcntl.flock(index, fcntl.LOCK_UN)
+
+    def refresh(self):
+        """Read index entries appended since the last refresh"""
+        for index_path in self.root.glob(f"*{self.INDEX_SUFFIX}"):
+            shard = index_path.name[: -len(self.INDEX_SUFFIX)]
+            start = self.index_offsets.get(shard, 0)
+
+            with open(index_path, "rb") as f:
+                f.seek(start)
+                content = f.read()
+
+            # an entry being written has no newline yet
+            end = content.rfind(b"\n") + 1
+            for line in content[:end].decode().splitlines():
+                run_id, stream, offset, length, compression = line.split("\t")
+                self.index[(run_id, stream)] = (
+                    shard,
+                    int(offset),
+                    int(length),
+                    compression or None,
+                )
+            self.index_offsets[shard] = start + end
+
+    def locate(self, run_id, stream="out"):
+        """Find where an output of a run is stored
+
+        Args:
+            run_id (str): the run id
+            stream (str, optional): "out" or "err". Defaults to "out".
+
+        Raises:
+            FileNotFoundError: If the output is not in any pack
+
+        Returns:
+            tuple: (shard, offset, length, compression)
+        """
+        key = (run_id, stream)
+        if key not in self.index:
+            self.refresh()
+        if key not in self.index:
+            raise FileNotFoundError(f"No {stream} stored for {run_id}")
+        return self.index[key]
+
+    def open(self, run_id, stream="out"):
+        """Open an output of a run for reading, decompressing if needed
+
+        Args:
+            run_id (str): the run id
+            stream (str, optional): "out" or "err". Defaults to "out".
+
+        Returns:
+            file: binary file object
+        """
+        shard, offset, length, compression = self.locate(run_id, stream)
+        f = open(self.get_pack_path(shard), "rb")
+        pack_slice = io.BufferedReader(PackSlice(f, offset, length))
+        return decompress_stream(pack_slice, compression)
+
+    def runs(self):
+        """Get the ids of all runs with stored outputs"""
+        self.refresh()
+        return {run_id for (run_id, _) in self.index}
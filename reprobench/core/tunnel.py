@@ -0,0 +1,221 @@
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from loguru import logger
+from sshtunnel import SSHTunnelForwarder
+
+STATE_DIR = Path(tempfile.gettempdir()) / f"reprobench-tunnels-{os.getuid()}"
+
+
+def open_tunnel(tunneling):
+    """Start an SSH tunnel to the server
+
+    Args:
+        tunneling (dict): host, port, key_file and ssh_config_file of the tunnel
+
+    Returns:
+        SSHTunnelForwarder: the started forwarder
+    """
+    server = SSHTunnelForwarder(
+        tunneling["host"],
+        remote_bind_address=("127.0.0.1", tunneling["port"]),
+        ssh_pkey=tunneling["key_file"],
+        ssh_config_file=tunneling["ssh_config_file"],
+    )
+
+    # https://github.com/pahaz/sshtunnel/issues/138
+    if sys.version_info[0] > 3 or (
+        sys.version_info[0] == 3 and sys.version_info[1] >= 7
+    ):
+        server.daemon_forward_servers = True
+
+    server.start()
+    logger.info(f"Tunneling established at 127.0.0.1:{server.local_bind_port}")
+    return server
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedTunnel:
+    """A tunnel shared by all the processes of a node through a broker
+
+    The first process attaching starts a detached broker holding the SSH
+    tunnel, later ones reuse its local port. Each attached process is
+    referenced by a file named after its pid, and the broker tears the tunnel
+    down once no referencing process is alive for `BrokerProcess.IDLE_TIMEOUT`
+    seconds. All changes to the state happen under a lock file.
+
+    Args:
+        tunneling (dict): host, port, key_file and ssh_config_file of the tunnel
+        state_dir (str, optional): directory of the brokers of this node
+    """
+
+    START_TIMEOUT = 60
+
+    def __init__(self, tunneling, state_dir=STATE_DIR):
+        self.tunneling = tunneling
+        key = json.dumps([str(tunneling[k]) for k in sorted(tunneling)])
+        name = hashlib.sha1(key.encode()).hexdigest()[:16]
+
+        self.state_dir = Path(state_dir)
+        self.lock_path = self.state_dir / f"{name}.lock"
+        self.state_path = self.state_dir / f"{name}.json"
+        self.refs_dir = self.state_dir / f"{name}.refs"
+        self.log_path = self.state_dir / f"{name}.log"
+        self.ref_path = None
+
+    def lock(self):
+        self.state_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def read_state(self):
+        try:
+            state = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return None
+        return state if _is_alive(state["pid"]) else None
+
+    def start_broker(self):
+        tunneling = self.tunneling
+        cmd = [
+            sys.executable,
+            "-m",
+            "reprobench.core.tunnel",
+            f"--host={tunneling['host']}",
+            f"--port={tunneling['port']}",
+            f"--ssh-config-file={tunneling['ssh_config_file']}",
+            f"--state={self.state_path}",
+            f"--refs={self.refs_dir}",
+            f"--lock={self.lock_path}",
+        ]
+        if tunneling["key_file"] is not None:
+            cmd.append(f"--key-file={tunneling['key_file']}")
+
+        with open(self.log_path, "a") as log:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                start_new_session=True,
+            )
+
+        deadline = time.monotonic() + self.START_TIMEOUT
+        while time.monotonic() < deadline:
+            state = self.read_state()
+            if state is not None:
+                return state
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+
+        raise RuntimeError(f"Tunnel broker failed to start, see {self.log_path}")
+
+    def attach(self):
+        """Reference the tunnel, starting its broker if needed
+
+        Returns:
+            str: the local address of the server
+        """
+        with self.lock():
+            state = self.read_state()
+            if state is None:
+                logger.debug("Starting a tunnel broker for this node")
+                state = self.start_broker()
+
+            self.refs_dir.mkdir(exist_ok=True)
+            self.ref_path = self.refs_dir / str(os.getpid())
+            self.ref_path.touch()
+
+        atexit.register(self.detach)
+        address = f"tcp://127.0.0.1:{state['port']}"
+        logger.info(f"Using shared tunnel at {address}")
+        return address
+
+    def detach(self):
+        if self.ref_path is not None and self.ref_path.exists():
+            self.ref_path.unlink()
+        self.ref_path = None
+
+
+class BrokerProcess:
+    """Hold an SSH tunnel while processes reference it"""
+
+    POLL_INTERVAL = 2
+    IDLE_TIMEOUT = 10
+
+    def __init__(self, tunneling, state_path, refs_dir, lock_path):
+        self.tunneling = tunneling
+        self.state_path = Path(state_path)
+        self.refs_dir = Path(refs_dir)
+        self.lock_path = Path(lock_path)
+
+    def count_refs(self):
+        count = 0
+        for ref in self.refs_dir.glob("*"):
+            if _is_alive(int(ref.name)):
+                count += 1
+            else:
+                ref.unlink()
+        return count
+
+    def run(self):
+        server = open_tunnel(self.tunneling)
+        state = dict(pid=os.getpid(), port=server.local_bind_port)
+        self.state_path.write_text(json.dumps(state))
+
+        idle_since = None
+        while True:
+            time.sleep(self.POLL_INTERVAL)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if self.count_refs() > 0:
+                    idle_since = None
+                    continue
+
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since > self.IDLE_TIMEOUT:
+                    # nobody can attach while the state is removed under the lock
+                    self.state_path.unlink()
+                    break
+
+        server.stop()
+        logger.info("Tunnel closed, no process is using it anymore")
+
+
+@click.command()
+@click.option("--host", required=True)
+@click.option("--port", type=int, required=True)
+@click.option("--key-file", default=None)
+@click.option("--ssh-config-file", required=True)
+@click.option("--state", required=True)
+@click.option("--refs", required=True)
+@click.option("--lock", required=True)
+def cli(host, port, key_file, ssh_config_file, state, refs, lock):
+    tunneling = dict(
+        host=host, port=port, key_file=key_file, ssh_config_file=ssh_config_file
+    )
+    BrokerProcess(tunneling, state, refs, lock).run()
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,106 +1,232 @@
-import sys
+import os
 import atexit
+import cProfile
 import json
+import signal
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from fnmatch import fnmatch
 from pathlib import Path
 
 import click
 import zmq
-from sshtunnel import SSHTunnelForwarder
 from loguru import logger
 
-from reprobench.console.decorators import common, server_info, use_tunneling
+from reprobench.console.decorators import (
+    common,
+    server_info,
+    use_tunneling,
+    worker_options,
+)
+from reprobench.core.cache import get_tool_cache
 from reprobench.core.events import (
     RUN_FINISH,
     RUN_INTERRUPT,
     RUN_START,
     RUN_STEP,
+    RUN_TIMINGS,
     WORKER_JOIN,
     WORKER_LEAVE,
 )
-from reprobench.utils import decode_message, import_class, send_event
+from reprobench.core.tunnel import SharedTunnel
+from reprobench.utils import decode_message, send_event
 
 REQUEST_TIMEOUT = 15000
 
+# slack on top of a run's time limit for the executor's wall grace and the
+# steps around the tool
+RUN_TIME_SLACK = 60
+
+
+def get_job_id():
+    """Get the id of the scheduler job this worker runs in, if any
+
+    Array tasks are identified as `<array job id>_<task id>`, as in sacct.
+    """
+    if "SLURM_ARRAY_JOB_ID" in os.environ:
+        array_job = os.environ["SLURM_ARRAY_JOB_ID"]
+        return f"{array_job}_{os.environ['SLURM_ARRAY_TASK_ID']}"
+    return os.environ.get("SLURM_JOB_ID")
+
 
 class BenchmarkWorker:
-    def __init__(self, server_address, tunneling=None):
+    def __init__(
+        self,
+        server_address,
+        tunneling=None,
+        profile_dir=None,
+        profile_runs="*",
+        cache_dir=None,
+    ):
         self.server_address = server_address
+        self.cache = get_tool_cache(cache_dir)
+        self.profile_dir = profile_dir
+        self.profile_runs = profile_runs
+        self.timings = OrderedDict()
 
         if tunneling is not None:
-            self.server = SSHTunnelForwarder(
-                tunneling["host"],
-                remote_bind_address=("127.0.0.1", tunneling["port"]),
-                ssh_pkey=tunneling["key_file"],
-                ssh_config_file=tunneling["ssh_config_file"],
-            )
-
-            # https://github.com/pahaz/sshtunnel/issues/138
-            if sys.version_info[0] > 3 or (
-                sys.version_info[0] == 3 and sys.version_info[1] >= 7
-            ):
-                self.server.daemon_forward_servers = True
-
-            self.server.start()
-            self.server_address = f"tcp://127.0.0.1:{self.server.local_bind_port}"
-            logger.info(f"Tunneling established at {self.server_address}")
-            atexit.register(self.stop_tunneling)
+            # workers of a node share a single SSH session to the server
+            self.server_address = SharedTunnel(tunneling).attach()
 
     def killed(self, run_id):
         send_event(self.socket, RUN_INTERRUPT, run_id)
         send_event(self.socket, WORKER_LEAVE)
 
-    def stop_tunneling(self):
-        self.server.stop()
-
-    def run(self):
+    @contextmanager
+    def timed(self, phase):
+        """Add the wall time spent in the block to the timing of `phase`"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.timings[phase] = self.timings.get(phase, 0.0) + elapsed
+
+    def send(self, event_type, payload=None):
+        with self.timed("send"):
+            send_event(self.socket, event_type, payload)
+
+    @contextmanager
+    def profile(self, run_id):
+        """Profile the block with cProfile if the run is selected for it
+
+        Profiles are dumped to `<profile_dir>/<run_id>.prof`, with the
+        slashes of the run id replaced by double underscores.
+        """
+        if self.profile_dir is None or not fnmatch(run_id, self.profile_runs):
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profile_path = Path(self.profile_dir) / f"{run_id.replace('/', '__')}.prof"
+            profile_path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(profile_path))
+            logger.debug(f"Profile of {run_id} written to {profile_path}")
+
+    def connect(self):
         context = zmq.Context()
         self.socket = context.socket(zmq.DEALER)
         logger.debug(f"Connecting to {self.server_address}")
         self.socket.connect(self.server_address)
 
+    def request_run(self):
         send_event(self.socket, WORKER_JOIN)
-        run = decode_message(self.socket.recv())
+        return decode_message(self.socket.recv())
 
+    def process_run(self, run):
         self.run_id = run["id"]
+        self.timings = OrderedDict()
         atexit.register(self.killed, self.run_id)
 
-        tool = import_class(run["tool"])
+        with self.profile(self.run_id), self.timed("total"):
+            with self.timed("import"):
+                tool = self.cache.import_class(run["tool"])
+
+            with self.timed("setup"):
+                if not self.cache.is_ready(run["tool"], tool):
+                    tool.setup()
+
+            context = {}
+            context["socket"] = self.socket
+            context["tool"] = tool
+            context["run"] = run
+            logger.info(f"Processing task: {run['id']}")
+
+            with self.timed("version"):
+                tool_version = self.cache.version(run["tool"], tool)
+
+            payload = dict(tool_version=tool_version, run_id=self.run_id)
+            job_id = get_job_id()
+            if job_id is not None:
+                payload["job_id"] = job_id
+            self.send(RUN_START, payload)
+
+            for runstep in run["steps"]:
+                logger.debug(f"Running step {runstep['module']}")
+                phase = f"step:{runstep['module']}"
+                with self.timed("import"):
+                    step = self.cache.import_class(runstep["module"])
+                config = json.loads(runstep["config"])
+                with self.timed(phase):
+                    step.execute(context, config)
+                payload = {
+                    "run_id": self.run_id,
+                    "step": runstep["module"],
+                    "time": self.timings[phase],
+                }
+                self.send(RUN_STEP, payload)
+
+        # sent apart from RUN_FINISH, which servers expect to be the bare run id
+        payload = dict(run_id=self.run_id, timings=dict(self.timings))
+        send_event(self.socket, RUN_TIMINGS, payload)
+        send_event(self.socket, RUN_FINISH, self.run_id)
+        atexit.unregister(self.killed)
+        send_event(self.socket, WORKER_LEAVE, self.run_id)
 
-        if not tool.is_ready():
-            tool.setup()
+    def run(self, max_runs=1, time_budget=None):
+        """Process runs from the server until it has no pending runs left
 
-        context = {}
-        context["socket"] = self.socket
-        context["tool"] = tool
-        context["run"] = run
-        logger.info(f"Processing task: {run['id']}")
+        Args:
+            max_runs (int, optional): stop after this many runs, 0 for no
+                limit. Defaults to 1.
+            time_budget (float, optional): seconds this worker may run. A run
+                that may not finish within the budget is handed back.
+        """
+        start = time.monotonic()
+        self.connect()
+        processed = 0
+        while max_runs == 0 or processed < max_runs:
+            run = self.request_run()
+            if run is None:
+                logger.info("No pending runs left")
+                return
 
-        directory = Path(run["id"])
-        directory.mkdir(parents=True, exist_ok=True)
+            if time_budget is not None:
+                remaining = time_budget - (time.monotonic() - start)
+                if remaining < float(run["limits"]["time"]) + RUN_TIME_SLACK:
+                    logger.info(f"Not enough time left for {run['id']}")
+                    send_event(self.socket, RUN_INTERRUPT, run["id"])
+                    return
 
-        payload = dict(tool_version=tool.version(), run_id=self.run_id)
-        send_event(self.socket, RUN_START, payload)
+            self.process_run(run)
+            processed += 1
 
-        for runstep in run["steps"]:
-            logger.debug(f"Running step {runstep['module']}")
-            step = import_class(runstep["module"])
-            config = json.loads(runstep["config"])
-            step.execute(context, config)
-            payload = {"run_id": self.run_id, "step": runstep["module"]}
-            send_event(self.socket, RUN_STEP, payload)
 
-        send_event(self.socket, RUN_FINISH, self.run_id)
-        atexit.unregister(self.killed)
-        send_event(self.socket, WORKER_LEAVE, self.run_id)
+def exit_on_signal(signum, frame):
+    raise SystemExit(128 + signum)
 
 
 @click.command("worker")
+@click.option(
+    "-n",
+    "--max-runs",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of runs to process before exiting, 0 to drain the queue",
+)
+@click.option(
+    "--time-budget",
+    type=float,
+    default=None,
+    help="Seconds available to this worker, no run is started beyond it",
+)
+@worker_options
 @server_info
 @use_tunneling
 @common
-def cli(**kwargs):
+def cli(max_runs, time_budget, **kwargs):
+    # e.g. a canceled job, unwinding lets the executor kill and clean up the
+    # current run, which is then handed back
+    signal.signal(signal.SIGTERM, exit_on_signal)
     worker = BenchmarkWorker(**kwargs)
-    worker.run()
+    worker.run(max_runs=max_runs, time_budget=time_budget)
 
 
 if __name__ == "__main__":
@@ -2,3 +2,5 @@ from .base import RunStatisticObserver
 
 # from .runsolver import RunsolverExecutor
 from .psmon import PsmonExecutor
+from .cgroup import CgroupExecutor
+from .rusage import RusageExecutor
@@ -1,21 +1,174 @@
+import os
+import platform
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
 from reprobench.core.base import Step, Observer
-from reprobench.executors.events import STORE_RUNSTATS
+from reprobench.core.exceptions import NotSupportedError
+from reprobench.core.storage import PACK_DIR, PackStore
+from reprobench.executors.events import STORE_RUNSTATS, STORE_TIMESERIES
+from reprobench.utils import get_compressed_path, open_decompressed, send_event
 
-from .db import RunStatistic
+from .capture import BoundedOutput
+from .db import RunStatistic, RunTimeSeries
+from .sampler import ResourceSampler
 
 
 class RunStatisticObserver(Observer):
-    SUBSCRIBED_EVENTS = (STORE_RUNSTATS,)
+    SUBSCRIBED_EVENTS = (STORE_RUNSTATS, STORE_TIMESERIES)
 
     @classmethod
     def handle_event(cls, event_type, payload, **kwargs):
         if event_type == STORE_RUNSTATS:
             RunStatistic.insert(**payload).on_conflict("replace").execute()
+        elif event_type == STORE_TIMESERIES:
+            RunTimeSeries.insert(**payload).on_conflict("replace").execute()
 
 
 class Executor(Step):
-    def __init__(self, *args, **kwargs):
-        pass
+    def __init__(self, context, config=None):
+        if config is None:
+            config = {}
+
+        self.socket = context["socket"]
+        self.run_id = context["run"]["id"]
+
+        wall_grace = config.get("wall_grace", 15)
+        self.nonzero_as_rte = config.get("nonzero_rte", True)
+
+        limits = context["run"]["limits"]
+        time_limit = float(limits["time"])
+        MB = 1024 * 1024
+
+        # the time limit was lowered by adaptive capping
+        self.capped = context["run"].get("capped", False)
+        self.wall_limit = time_limit + wall_grace
+        self.cpu_limit = time_limit
+        self.mem_limit = float(limits["memory"]) * MB
+
+        self.output_limit = None
+        if "output" in limits:
+            self.output_limit = int(float(limits["output"]) * MB)
+        self.output_kill = config.get("output_mode", "truncate") == "kill"
+        self.output_tail_ratio = float(config.get("output_tail", 0.5))
+        if not 0 <= self.output_tail_ratio <= 1:
+            raise ValueError(
+                f"output_tail must be between 0 and 1, got {self.output_tail_ratio}"
+            )
+        self.compression = config.get("compression", None)
+        self.compression_level = config.get("compression_level", None)
+        if self.compression_level is not None:
+            self.compression_level = int(self.compression_level)
+
+        self.storage = None
+        if config.get("storage", "directory") == "pack":
+            pack_dir = config.get("pack_dir")
+            if pack_dir is None:
+                output_dir = context["run"].get("output_dir")
+                if output_dir is None:
+                    raise NotSupportedError(
+                        "The server did not send the output directory, set `pack_dir`"
+                    )
+                pack_dir = Path(output_dir) / PACK_DIR
+            shard = platform.node()
+            if config.get("pack_shard", "node") == "worker":
+                shard = f"{shard}-{os.getpid()}"
+            self.storage = PackStore(pack_dir, shard=shard)
+
+        self.sample_interval = config.get("sample_interval", None)
+        if self.sample_interval is not None:
+            self.sample_interval = float(self.sample_interval)
+        self.sample_batch = int(config.get("sample_batch", 100))
+
+    def get_verdict(
+        self,
+        return_code,
+        timeout=False,
+        memout=False,
+        output_exceeded=False,
+        error=False,
+    ):
+        if timeout:
+            return RunStatistic.CAPPED if self.capped else RunStatistic.TIMEOUT
+        elif memout:
+            return RunStatistic.MEMOUT
+        elif output_exceeded:
+            return RunStatistic.OUTPUT_LIMIT
+        elif error or (self.nonzero_as_rte and return_code != 0):
+            return RunStatistic.RUNTIME_ERR
+        return RunStatistic.SUCCESS
+
+    @contextmanager
+    def redirect_outputs(self, out_path, err_path, directory):
+        """Prepare the working directory and output targets of a run
+
+        Yields the directory to run in and an entered `BoundedOutput`. With
+        the pack storage, the run happens in a scratch directory and its
+        outputs are appended to the pack store afterwards.
+        """
+        output_options = dict(
+            limit=self.output_limit,
+            tail_ratio=self.output_tail_ratio,
+            kill=self.output_kill,
+            compression=self.compression,
+            compression_level=self.compression_level,
+        )
+
+        if self.storage is None:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            with BoundedOutput(out_path, err_path, **output_options) as output:
+                yield directory, output
+            return
+
+        with tempfile.TemporaryDirectory(prefix="reprobench-") as scratch:
+            scratch = Path(scratch)
+            cwd = scratch / "cwd"
+            cwd.mkdir()
+
+            paths = dict(out=scratch / "run.out", err=scratch / "run.err")
+            with BoundedOutput(paths["out"], paths["err"], **output_options) as output:
+                yield cwd, output
+
+            streams = {
+                stream: get_compressed_path(path, self.compression)
+                for stream, path in paths.items()
+            }
+            self.storage.append(self.run_id, streams, compression=self.compression)
+
+    def open_error(self, err_path):
+        """Open the error output of the run once stored, as a binary file"""
+        if self.storage is not None:
+            return self.storage.open(self.run_id, "err")
+        return open_decompressed(err_path)
+
+    @contextmanager
+    def sample_resources(self):
+        """Sample the resource usage of the run when `sample_interval` is set
+
+        Yields the `ResourceSampler`, or None when not sampling. The batches
+        are only sent once the run is over, as the socket must not be used
+        from the sampling thread.
+        """
+        if self.sample_interval is None or not ResourceSampler.is_available():
+            yield None
+            return
+
+        sampler = ResourceSampler(self.sample_interval, self.sample_batch)
+        sampler.start()
+        try:
+            yield sampler
+        finally:
+            sampler.stop()
+
+        for batch, samples in enumerate(sampler.batches):
+            payload = dict(
+                run_id=self.run_id,
+                batch=batch,
+                samples=len(samples),
+                data=RunTimeSeries.encode(samples),
+            )
+            send_event(self.socket, STORE_TIMESERIES, payload)
 
     def run(
         self,
@@ -31,9 +184,11 @@ class Executor(Step):
     @classmethod
     def register(cls, config=None):
         RunStatistic.create_table()
+        RunTimeSeries.create_table()
 
     @classmethod
     def execute(cls, context, config=None):
         tool = context["tool"]
         executor = cls(context, config)
+        context["storage"] = executor.storage
         tool(context).run(executor)
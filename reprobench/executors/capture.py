@@ -0,0 +1,171 @@
+import os
+import select
+import threading
+
+from loguru import logger
+
+from reprobench.utils import COMPRESSION_SUFFIXES, get_compressed_path, open_compressed
+
+
+class OutputCapture(threading.Thread):
+    """Drain a pipe into a file while keeping at most `limit` bytes of it
+
+    The first `limit - tail_size` bytes are written through as they come,
+    after that only the last `tail_size` bytes are kept in a ring buffer,
+    which is written after a truncation marker once the stream is closed.
+    With `kill` enabled the pipe is closed as soon as the limit is exceeded,
+    so the writing process is terminated by SIGPIPE on its next write, as
+    it is when the capture is stopped.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    POLL_INTERVAL = 0.1
+    MARKER = b"\n[reprobench: %d bytes of output truncated]\n"
+
+    def __init__(self, fd, out_file, limit=None, tail_size=0, kill=False):
+        super().__init__(daemon=True)
+        self.fd = fd
+        self.out_file = out_file
+        self.limit = limit
+        self.tail_size = 0 if limit is None else min(tail_size, limit)
+        self.kill = kill
+        self.written = 0
+        self.truncated = 0
+        self.tail = bytearray()
+        self.stopped = threading.Event()
+
+    def stop(self):
+        """Stop draining the pipe, even if it is still held open"""
+        self.stopped.set()
+
+    @property
+    def exceeded(self):
+        return self.truncated > 0
+
+    def _write(self, chunk):
+        head_limit = self.limit - self.tail_size
+
+        if self.written < head_limit:
+            head = chunk[: head_limit - self.written]
+            self.out_file.write(head)
+            self.written += len(head)
+            chunk = chunk[len(head) :]
+
+        if len(chunk) == 0:
+            return
+
+        self.tail += chunk
+        overflow = len(self.tail) - self.tail_size
+        if overflow > 0:
+            del self.tail[:overflow]
+            self.truncated += overflow
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                readable, _, _ = select.select([self.fd], [], [], self.POLL_INTERVAL)
+                if not readable:
+                    continue
+
+                chunk = os.read(self.fd, self.CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                if self.limit is None:
+                    self.out_file.write(chunk)
+                    continue
+
+                self._write(chunk)
+                if self.kill and self.exceeded:
+                    break
+        finally:
+            os.close(self.fd)
+
+        if self.exceeded:
+            self.out_file.write(self.MARKER % self.truncated)
+        self.out_file.write(self.tail)
+
+
+class BoundedOutput:
+    """Redirect the output streams of a run into files
+
+    Used as a context manager around the execution, `stdout` and `stderr`
+    are the targets to be handed to the process. Without an output limit
+    or compression these are the files themselves, otherwise they are pipes
+    drained by `OutputCapture` threads, one per stream, each bounded by
+    `limit` uncompressed bytes.
+    """
+
+    JOIN_TIMEOUT = 10
+
+    def __init__(
+        self,
+        out_path,
+        err_path,
+        limit=None,
+        tail_ratio=0.5,
+        kill=False,
+        compression=None,
+        compression_level=None,
+    ):
+        self.paths = (out_path, err_path)
+        self.limit = limit
+        self.tail_size = 0 if limit is None else int(limit * tail_ratio)
+        self.kill = kill
+        self.compression = compression
+        self.compression_level = compression_level
+        self.files = []
+        self.write_fds = []
+        self.captures = []
+        self.stdout = None
+        self.stderr = None
+
+    @property
+    def exceeded(self):
+        return any(capture.exceeded for capture in self.captures)
+
+    def _open(self, path):
+        # remove leftovers of a previous execution stored differently
+        for compression in (None, *COMPRESSION_SUFFIXES):
+            stale = get_compressed_path(path, compression)
+            if compression != self.compression and stale.exists():
+                stale.unlink()
+
+        out_file = open_compressed(
+            get_compressed_path(path, self.compression),
+            "wb",
+            self.compression,
+            self.compression_level,
+        )
+        self.files.append(out_file)
+
+        if self.limit is None and self.compression is None:
+            return out_file
+
+        read_fd, write_fd = os.pipe()
+        capture = OutputCapture(
+            read_fd, out_file, self.limit, tail_size=self.tail_size, kill=self.kill
+        )
+        capture.start()
+        self.captures.append(capture)
+        self.write_fds.append(write_fd)
+        return write_fd
+
+    def __enter__(self):
+        self.stdout, self.stderr = (self._open(path) for path in self.paths)
+        return self
+
+    def __exit__(self, *exc_info):
+        for write_fd in self.write_fds:
+            os.close(write_fd)
+
+        for capture in self.captures:
+            capture.join(self.JOIN_TIMEOUT)
+            if capture.is_alive():
+                # the capture closes its end of the pipe once stopped
+                logger.warning("Output is still held open by an orphaned process")
+                capture.stop()
+                capture.join()
+
+        for out_file in self.files:
+            out_file.close()
@@ -0,0 +1,336 @@
+import itertools
+import os
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from reprobench.utils import import_class, send_event
+
+from .base import Executor
+from .events import STORE_RUNSTATS
+
+CONTROLLERS = ("cpu", "memory", "pids")
+WORKER_LEAF = "worker"
+
+# moves the shell into the cgroup given as $0 before exec-ing the command,
+# so no code has to run between fork and exec in this (threaded) process
+CGROUP_SHIM = 'echo $$ > "$0/cgroup.procs" && exec "$@"'
+
+
+def get_cgroup2_mount():
+    """Get the mount point of the cgroup v2 hierarchy
+
+    Returns:
+        Path: the mount point, or None if cgroup v2 is not mounted
+    """
+    try:
+        mounts = Path("/proc/self/mounts").read_text().splitlines()
+    except OSError:
+        return None
+
+    for mount in mounts:
+        _, mount_point, fstype, *_ = mount.split()
+        if fstype == "cgroup2":
+            return Path(mount_point)
+
+    return None
+
+
+def get_current_cgroup():
+    """Get the cgroup v2 directory of the current process
+
+    Returns:
+        Path: the cgroup directory, or None without a cgroup v2 hierarchy
+    """
+    mount_point = get_cgroup2_mount()
+    if mount_point is None:
+        return None
+
+    for line in Path("/proc/self/cgroup").read_text().splitlines():
+        hierarchy, _, path = line.split(":", 2)
+        if hierarchy == "0":
+            return mount_point / path.lstrip("/")
+
+    return None
+
+
+def get_cgroup_root():
+    """Get the cgroup to create the run cgroups in by default
+
+    This is the cgroup of the worker, or its parent once the worker lives in
+    the leaf created by `move_to_leaf`.
+    """
+    cgroup = get_current_cgroup()
+    if cgroup is not None and cgroup.name == WORKER_LEAF:
+        return cgroup.parent
+    return cgroup
+
+
+def move_to_leaf(cgroup):
+    """Move the processes of `cgroup` into its `worker` leaf child
+
+    Under the "no internal processes" rule of cgroup v2, controllers can only
+    be enabled for the children of a cgroup without processes of its own,
+    which is not the case of the cgroup the worker started in. The root of
+    the hierarchy is exempt from the rule and is left as is.
+    """
+    if cgroup == get_cgroup2_mount():
+        return
+
+    leaf = cgroup / WORKER_LEAF
+    leaf.mkdir(exist_ok=True)
+    for pid in (cgroup / "cgroup.procs").read_text().split():
+        try:
+            (leaf / "cgroup.procs").write_text(pid)
+        except ProcessLookupError:
+            # exited in the meantime
+            pass
+
+
+def enable_controllers(cgroup, move_processes=False):
+    """Enable the controllers needed by the executor for children of `cgroup`
+
+    Args:
+        cgroup (Path): the parent of the run cgroups
+        move_processes (bool, optional): move the processes of `cgroup` into
+            a leaf child first. Defaults to False.
+
+    Returns:
+        bool: whether all the controllers are available to child cgroups
+    """
+    subtree_control = cgroup / "cgroup.subtree_control"
+    try:
+        enabled = subtree_control.read_text().split()
+        missing = [c for c in CONTROLLERS if c not in enabled]
+        if missing:
+            if move_processes:
+                move_to_leaf(cgroup)
+            subtree_control.write_text(" ".join(f"+{c}" for c in missing))
+    except OSError as e:
+        logger.warning(f"Cannot enable cgroup controllers in {cgroup}: {e}")
+        return False
+
+    return True
+
+
+class CgroupExecutor(Executor):
+    """Executor that runs each run in its own cgroup v2
+
+    Memory and process count are enforced by the kernel through `memory.max`
+    and `pids.max`, and `cpu.max` bounds the run to `limits.cores` cores.
+    CPU time and peak memory are read from `cpu.stat` and `memory.peak`, so
+    short-lived children and short peaks are accounted for exactly.
+
+    The cgroups are created under `cgroup_root`, which needs the cpu, memory
+    and pids controllers delegated. By default this is the cgroup of the
+    worker, whose processes are then moved to a `worker` leaf child so that
+    the controllers can be enabled. When that is not possible, runs are
+    handed to the `fallback` executor.
+    """
+
+    _available = {}
+    _counter = itertools.count()
+
+    def __init__(self, context, config=None):
+        super().__init__(context, config)
+
+        if config is None:
+            config = {}
+
+        root = config.get("cgroup_root")
+        self.cgroup_root = Path(root) if root else get_cgroup_root()
+        self.pids_limit = config.get("pids", None)
+
+        limits = context["run"]["limits"]
+        self.cores = float(limits["cores"]) if "cores" in limits else None
+
+        self.fallback = None
+        if not self.is_available(self.cgroup_root, move_processes=not root):
+            fallback = config.get("fallback", "reprobench.executors.RusageExecutor")
+            logger.warning(f"cgroup v2 delegation unavailable, using {fallback}")
+            self.fallback = import_class(fallback)(context, config)
+            self.storage = self.fallback.storage
+
+    @classmethod
+    def is_available(cls, cgroup_root, move_processes=False):
+        if cgroup_root is None:
+            return False
+        if cgroup_root not in cls._available:
+            available = os.access(cgroup_root, os.W_OK) and enable_controllers(
+                cgroup_root, move_processes
+            )
+            cls._available[cgroup_root] = available
+        return cls._available[cgroup_root]
+
+    def create_cgroup(self):
+        cgroup = self.cgroup_root / f"reprobench-{os.getpid()}-{next(self._counter)}"
+        cgroup.mkdir()
+
+        (cgroup / "memory.max").write_text(str(int(self.mem_limit)))
+        if (cgroup / "memory.swap.max").exists():
+            (cgroup / "memory.swap.max").write_text("0")
+        if (cgroup / "memory.oom.group").exists():
+            (cgroup / "memory.oom.group").write_text("1")
+
+        if self.cores is not None:
+            period = 100000
+            (cgroup / "cpu.max").write_text(f"{int(self.cores * period)} {period}")
+        if self.pids_limit is not None:
+            (cgroup / "pids.max").write_text(str(self.pids_limit))
+
+        return cgroup
+
+    @staticmethod
+    def read_keyed(path):
+        content = path.read_text().split()
+        return {key: int(value) for key, value in zip(content[::2], content[1::2])}
+
+    def get_cpu_time(self, cgroup):
+        return self.read_keyed(cgroup / "cpu.stat")["usage_usec"] / 1e6
+
+    def kill_cgroup(self, cgroup):
+        kill_file = cgroup / "cgroup.kill"
+        if kill_file.exists():
+            kill_file.write_text("1")
+            return
+
+        for _ in range(100):
+            pids = (cgroup / "cgroup.procs").read_text().split()
+            if not pids:
+                break
+            for pid in pids:
+                try:
+                    os.kill(int(pid), signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            time.sleep(0.01)
+
+    def remove_cgroup(self, cgroup):
+        self.kill_cgroup(cgroup)
+        for _ in range(100):
+            try:
+                cgroup.rmdir()
+                return
+            except OSError:
+                time.sleep(0.01)
+        logger.warning(f"Could not remove {cgroup}")
+
+    def wait(self, process, cgroup, start):
+        """Wait for the process, enforcing the wall and CPU time limits
+
+        Instead of polling at a fixed rate, the next check is scheduled at
+        the earliest time a limit could possibly be reached, given that the
+        run cannot use more than its number of cores.
+        """
+        result = {}
+        finished = threading.Event()
+
+        def waiter():
+            result["status"] = os.wait4(process.pid, 0)
+            finished.set()
+
+        threading.Thread(target=waiter, daemon=True).start()
+
+        rate = self.cores or os.cpu_count()
+        timeout = False
+        while not finished.is_set():
+            cpu_time = self.get_cpu_time(cgroup)
+            wall_time = time.monotonic() - start
+            if cpu_time > self.cpu_limit or wall_time > self.wall_limit:
+                timeout = True
+                self.kill_cgroup(cgroup)
+                break
+
+            next_check = min(
+                (self.cpu_limit - cpu_time) / rate, self.wall_limit - wall_time
+            )
+            finished.wait(max(next_check, 0.01))
+
+        finished.wait()
+        _, status, rusage = result["status"]
+        return status, rusage, timeout
+
+    def run(
+        self,
+        cmdline,
+        out_path=None,
+        err_path=None,
+        input_str=None,
+        directory=None,
+        **kwargs,
+    ):
+        if self.fallback is not None:
+            return self.fallback.run(
+                cmdline,
+                out_path=out_path,
+                err_path=err_path,
+                input_str=input_str,
+                directory=directory,
+                **kwargs,
+            )
+
+        cgroup = self.create_cgroup()
+        try:
+            with self.redirect_outputs(out_path, err_path, directory) as (
+                cwd,
+                output,
+            ), self.sample_resources():
+                logger.debug(f"Running {directory} in {cgroup}")
+                start = time.monotonic()
+                process = subprocess.Popen(
+                    ["/bin/sh", "-c", CGROUP_SHIM, str(cgroup), *map(str, cmdline)],
+                    cwd=cwd,
+                    stdin=subprocess.PIPE if input_str is not None else None,
+                    stdout=output.stdout,
+                    stderr=output.stderr,
+                )
+                if input_str is not None:
+                    process.stdin.write(input_str.encode())
+                    process.stdin.close()
+
+                try:
+                    status, rusage, timeout = self.wait(process, cgroup, start)
+                except BaseException:
+                    # e.g. the worker is shut down
+                    self.kill_cgroup(cgroup)
+                    raise
+                wall_time = time.monotonic() - start
+                if os.WIFSIGNALED(status):
+                    process.returncode = -os.WTERMSIG(status)
+                else:
+                    process.returncode = os.WEXITSTATUS(status)
+                # reap orphans still holding the output pipes
+                self.kill_cgroup(cgroup)
+                logger.debug(f"Finished {directory}")
+
+            memory_events = self.read_keyed(cgroup / "memory.events")
+            cpu_time = self.get_cpu_time(cgroup)
+            peak_file = cgroup / "memory.peak"
+            if peak_file.exists():
+                max_memory = int(peak_file.read_text()) / 1024
+            else:
+                max_memory = rusage.ru_maxrss
+        finally:
+            self.remove_cgroup(cgroup)
+
+        return_code = process.returncode
+        verdict = self.get_verdict(
+            return_code,
+            timeout=timeout,
+            memout=memory_events.get("oom_kill", 0) > 0,
+            output_exceeded=output.exceeded,
+        )
+
+        payload = dict(
+            run_id=self.run_id,
+            verdict=verdict,
+            cpu_time=cpu_time,
+            wall_time=wall_time,
+            max_memory=max_memory,
+            return_code=return_code,
+        )
+        send_event(self.socket, STORE_RUNSTATS, payload)
@@ -1,6 +1,11 @@
+import zlib
 from datetime import datetime
+
+import numpy
 from reprobench.core.db import BaseModel, Run
 from playhouse.apsw_ext import (
+    BlobField,
+    CompositeKey,
     ForeignKeyField,
     FloatField,
     CharField,
@@ -11,6 +16,7 @@ from playhouse.apsw_ext import (
 
 class RunStatistic(BaseModel):
     TIMEOUT = "TLE"
+    CAPPED = "CAP"
     MEMOUT = "MEM"
     RUNTIME_ERR = "RTE"
     OUTPUT_LIMIT = "OLE"
@@ -18,6 +24,7 @@ class RunStatistic(BaseModel):
 
     VERDICT_CHOICES = (
         (TIMEOUT, "Time Limit Exceeded"),
+        (CAPPED, "Capped Time Limit Exceeded"),
         (MEMOUT, "Memory Limit Exceeded"),
         (RUNTIME_ERR, "Runtime Error"),
         (OUTPUT_LIMIT, "Output Limit Exceeded"),
@@ -33,3 +40,43 @@ class RunStatistic(BaseModel):
     max_memory = FloatField(help_text="Max Memory Usage (KiB)", null=True)
     return_code = IntegerField(help_text="Process Return Code", null=True)
     verdict = CharField(choices=VERDICT_CHOICES, max_length=3, null=True)
+
+
+class RunTimeSeries(BaseModel):
+    """A batch of resource usage samples of a run
+
+    The samples are stored column by column as delta-encoded, zlib-compressed
+    little-endian int64 arrays, one row per batch.
+    """
+
+    COLUMNS = ("time", "rss", "cpu", "threads")
+    HELP = {
+        "time": "Time since the start of the run (ms)",
+        "rss": "Resident Set Size of all processes (KiB)",
+        "cpu": "CPU utilization (permille of one core)",
+        "threads": "Number of threads",
+    }
+
+    run = ForeignKeyField(Run, backref="timeseries", on_delete="cascade")
+    batch = IntegerField()
+    samples = IntegerField()
+    data = BlobField()
+
+    class Meta:
+        primary_key = CompositeKey("run", "batch")
+
+    @classmethod
+    def encode(cls, samples):
+        """Encode samples, tuples of ints in the order of `COLUMNS`"""
+        columns = numpy.array(samples, dtype="<i8").reshape(-1, len(cls.COLUMNS)).T
+        deltas = numpy.diff(columns, axis=1, prepend=0)
+        return zlib.compress(deltas.tobytes())
+
+    def decode(self):
+        """Decode the samples of this batch
+
+        Returns:
+            numpy.ndarray: array of shape (len(COLUMNS), samples)
+        """
+        deltas = numpy.frombuffer(zlib.decompress(self.data), dtype="<i8")
+        return numpy.cumsum(deltas.reshape(len(self.COLUMNS), -1), axis=1)
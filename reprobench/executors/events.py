@@ -1 +1,2 @@
 STORE_RUNSTATS = b"executor:store_runstats"
+STORE_TIMESERIES = b"executor:store_timeseries"
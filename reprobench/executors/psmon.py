@@ -11,48 +11,32 @@ except ImportError:
 from reprobench.utils import send_event
 
 from .base import Executor
-from .db import RunStatistic
 from .events import STORE_RUNSTATS
 
 
 class PsmonExecutor(Executor):
-    def __init__(self, context, config):
-        self.socket = context["socket"]
-        self.run_id = context["run"]["id"]
-
-        if config is None:
-            config = {}
-
-        wall_grace = config.get("wall_grace", 15)
-        self.nonzero_as_rte = config.get("nonzero_rte", True)
-
-        limits = context["run"]["limits"]
-        time_limit = float(limits["time"])
-        MB = 1024 * 1024
-
-        self.wall_limit = time_limit + wall_grace
-        self.cpu_limit = time_limit
-        self.mem_limit = float(limits["memory"]) * MB
-
-    def compile_stats(self, stats):
-        verdict = None
-        if stats["error"] == TimeoutError:
-            verdict = RunStatistic.TIMEOUT
-        elif stats["error"] == MemoryError:
-            verdict = RunStatistic.MEMOUT
-        elif stats["error"] or (self.nonzero_as_rte and stats["return_code"] != 0):
-            verdict = RunStatistic.RUNTIME_ERR
-        else:
-            verdict = RunStatistic.SUCCESS
+    def compile_stats(self, stats, output_exceeded=False):
+        verdict = self.get_verdict(
+            stats["return_code"],
+            timeout=stats["error"] == TimeoutError,
+            memout=stats["error"] == MemoryError,
+            output_exceeded=output_exceeded,
+            error=bool(stats["error"]),
+        )
 
         del stats["error"]
 
+        # psmon measures the memory in bytes, like the limit it is given
+        max_memory = stats["max_memory"]
+        if max_memory is not None:
+            max_memory /= 1024
+
         return dict(
             run_id=self.run_id,
             verdict=verdict,
             cpu_time=stats["cpu_time"],
             wall_time=stats["wall_time"],
-            max_memory=stats["max_memory"],
+            max_memory=max_memory,
             return_code=stats["return_code"],
         )
 
@@ -65,28 +49,26 @@ class PsmonExecutor(Executor):
         directory=None,
         **kwargs,
     ):
-        out_file = open(out_path, "wb")
-        err_file = open(err_path, "wb")
-
-        monitor = ProcessMonitor(
-            cmdline,
-            cwd=directory,
-            stdout=out_file,
-            stderr=err_file,
-            input=input_str,
-            freq=15,
-        )
-        monitor.subscribe("wall_time", WallTimeLimiter(self.wall_limit))
-        monitor.subscribe("cpu_time", CpuTimeLimiter(self.cpu_limit))
-        monitor.subscribe("max_memory", MaxMemoryLimiter(self.mem_limit))
-
-        logger.debug(f"Running {directory}")
-        stats = monitor.run()
-        logger.debug(f"Finished {directory}")
-
-        out_file.close()
-        err_file.close()
-
-        payload = self.compile_stats(stats)
+        with self.redirect_outputs(out_path, err_path, directory) as (
+            cwd,
+            output,
+        ), self.sample_resources():
+            monitor = ProcessMonitor(
+                cmdline,
+                cwd=cwd,
+                stdout=output.stdout,
+                stderr=output.stderr,
+                input=input_str,
+                freq=15,
+            )
+            monitor.subscribe("wall_time", WallTimeLimiter(self.wall_limit))
+            monitor.subscribe("cpu_time", CpuTimeLimiter(self.cpu_limit))
+            monitor.subscribe("max_memory", MaxMemoryLimiter(self.mem_limit))
+
+            logger.debug(f"Running {directory}")
+            stats = monitor.run()
+            logger.debug(f"Finished {directory}")
+
+        payload = self.compile_stats(stats, output_exceeded=output.exceeded)
         send_event(self.socket, STORE_RUNSTATS, payload)
 
@@ -0,0 +1,227 @@
+import math
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+from loguru import logger
+
+from reprobench.utils import send_event, tail_file
+
+from .base import Executor
+from .events import STORE_RUNSTATS
+
+# Runs in a small interpreter between the worker and the tool. A child's
+# ru_maxrss starts at the peak RSS of the process it was forked and exec-ed
+# from, so forking the tool from the (large) worker would inflate it.
+LAUNCHER = """
+import os, resource, signal, sys
+
+report_fd, wall_limit, cpu_limit, memory_rlimit, mem_limit = sys.argv[1:6]
+command = sys.argv[6:]
+
+cpu_limit = int(cpu_limit)
+resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+memory_rlimit = getattr(resource, memory_rlimit)
+resource.setrlimit(memory_rlimit, (int(mem_limit), int(mem_limit)))
+
+pid = None
+terminated = []
+
+def kill_tool():
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (OSError, TypeError):
+        pass
+
+def terminate(*args):
+    # the tool is in a session of its own, so the worker cannot reach it
+    terminated.append(True)
+    kill_tool()
+
+signal.signal(signal.SIGTERM, terminate)
+pid = os.fork()
+if pid == 0:
+    os.setsid()
+    try:
+        os.execvp(command[0], command)
+    finally:
+        os._exit(127)
+if terminated:
+    kill_tool()
+
+timed_out = []
+
+def kill(*args):
+    timed_out.append(True)
+    kill_tool()
+
+signal.signal(signal.SIGALRM, kill)
+signal.setitimer(signal.ITIMER_REAL, float(wall_limit))
+_, status, rusage = os.wait4(pid, 0)
+signal.setitimer(signal.ITIMER_REAL, 0)
+kill_tool()
+
+report = (status, rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss, len(timed_out))
+os.write(int(report_fd), " ".join(map(str, report)).encode())
+"""
+
+MEMORY_RLIMITS = {"as": "RLIMIT_AS", "data": "RLIMIT_DATA"}
+
+# allocation failures as reported by the C library and common runtimes
+MEMOUT_PATTERN = (
+    rb"[Cc]annot allocate memory|[Oo]ut of memory|std::bad_alloc|MemoryError"
+    rb"|OutOfMemoryError|memory allocation of \d+ bytes failed"
+)
+
+
+class RusageExecutor(Executor):
+    """Executor enforcing limits with rlimits and accounting with `wait4`
+
+    CPU time and memory are limited by the kernel through `RLIMIT_CPU` and
+    `RLIMIT_AS` (or `RLIMIT_DATA` with `memory_rlimit: data`), the wall time
+    by a timer killing the process group. Nothing is polled during the run.
+
+    The tool is started by a small launcher interpreter, which reports the
+    `wait4` rusage of the run. It includes all descendants that were waited
+    for, but not orphaned ones, and the peak memory is at least the few MiB
+    of the launcher. As rlimits are per process, children of multi-process
+    tools each get the full limits.
+
+    Hitting the memory rlimit makes allocations fail rather than kill the
+    process, and the refused allocation does not count in its peak memory.
+    A failed run is thus reported as MEM when the end of its error output
+    reports a failed allocation (`memout_pattern`, a bytes regex), or when
+    its peak memory reached `memout_ratio` of the limit.
+    """
+
+    MEMOUT_TAIL = 64 * 1024
+
+    def __init__(self, context, config=None):
+        super().__init__(context, config)
+
+        if config is None:
+            config = {}
+
+        self.memory_rlimit = MEMORY_RLIMITS[config.get("memory_rlimit", "as")]
+        self.memout_ratio = float(config.get("memout_ratio", 0.9))
+        self.memout_pattern = config.get("memout_pattern", MEMOUT_PATTERN)
+        if isinstance(self.memout_pattern, str):
+            self.memout_pattern = self.memout_pattern.encode()
+
+    def reported_memout(self, err_path):
+        """Whether the error output of the run reports a failed allocation"""
+        if err_path is None and self.storage is None:
+            return False
+        try:
+            with self.open_error(err_path) as f:
+                tail = tail_file(f, self.MEMOUT_TAIL)
+        except OSError:
+            return False
+        return re.search(self.memout_pattern, tail) is not None
+
+    def run(
+        self,
+        cmdline,
+        out_path=None,
+        err_path=None,
+        input_str=None,
+        directory=None,
+        **kwargs,
+    ):
+        report_read, report_write = os.pipe()
+        launcher = [
+            sys.executable,
+            "-S",
+            "-c",
+            LAUNCHER,
+            str(report_write),
+            str(self.wall_limit),
+            str(int(math.ceil(self.cpu_limit))),
+            self.memory_rlimit,
+            str(int(self.mem_limit)),
+        ]
+
+        with self.redirect_outputs(out_path, err_path, directory) as (
+            cwd,
+            output,
+        ), self.sample_resources() as sampler:
+            logger.debug(f"Running {directory}")
+            start = time.monotonic()
+            process = subprocess.Popen(
+                [*launcher, *map(str, cmdline)],
+                cwd=cwd,
+                stdin=subprocess.PIPE if input_str is not None else None,
+                stdout=output.stdout,
+                stderr=output.stderr,
+                pass_fds=(report_write,),
+            )
+            os.close(report_write)
+            if sampler is not None:
+                sampler.exclude(process.pid)
+
+            if input_str is not None:
+                process.stdin.write(input_str.encode())
+                process.stdin.close()
+
+            try:
+                process.wait()
+            except BaseException:
+                # e.g. the worker is shut down, the launcher kills the tool
+                process.terminate()
+                process.wait()
+                raise
+            wall_time = time.monotonic() - start
+            logger.debug(f"Finished {directory}")
+
+        with os.fdopen(report_read, "rb") as f:
+            report = f.read().split()
+
+        cpu_time, max_memory, timed_out = None, None, 0
+        if len(report) == 0:
+            logger.error(f"Launcher for {directory} exited with {process.returncode}")
+            return_code = process.returncode
+        else:
+            status, utime, stime, max_memory, timed_out = report
+            status = int(status)
+            cpu_time = float(utime) + float(stime)
+            max_memory = int(max_memory)
+
+            if os.WIFSIGNALED(status):
+                return_code = -os.WTERMSIG(status)
+            else:
+                return_code = os.WEXITSTATUS(status)
+
+        failed = return_code != 0 or len(report) == 0
+        timeout = (
+            int(timed_out) > 0
+            or return_code == -signal.SIGXCPU
+            or (failed and cpu_time is not None and cpu_time >= self.cpu_limit)
+        )
+        memout = failed and (
+            (
+                max_memory is not None
+                and max_memory * 1024 >= self.memout_ratio * self.mem_limit
+            )
+            or self.reported_memout(err_path)
+        )
+
+        verdict = self.get_verdict(
+            return_code,
+            timeout=timeout,
+            memout=memout,
+            output_exceeded=output.exceeded,
+            error=len(report) == 0,
+        )
+
+        payload = dict(
+            run_id=self.run_id,
+            verdict=verdict,
+            cpu_time=cpu_time,
+            wall_time=wall_time,
+            max_memory=max_memory,
+            return_code=return_code,
+        )
+        send_event(self.socket, STORE_RUNSTATS, payload)
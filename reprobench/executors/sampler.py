@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+
+from loguru import logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class ResourceSampler(threading.Thread):
+    """Sample the resource usage of all descendants of this process
+
+    Wrappers started by the executor around the tool (see `exclude`) are
+    left out of the sums, so that the samples match the run statistics.
+    Each sample is a tuple of the time since the start (ms), the summed RSS
+    (KiB), the CPU utilization since the previous sample (permille of one
+    core) and the number of threads, as stored by `RunTimeSeries`.
+
+    Args:
+        interval (float): seconds between samples
+        batch_size (int): number of samples per batch
+    """
+
+    def __init__(self, interval, batch_size=100):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batches = []
+        self.samples = []
+        self.stopped = threading.Event()
+        self.process = psutil.Process(os.getpid())
+        self.excluded = set()
+
+    def exclude(self, pid):
+        """Leave a wrapper process of the run out of the samples"""
+        self.excluded.add(pid)
+
+    def sample(self):
+        rss, cpu, threads = 0, 0.0, 0
+        for child in self.process.children(recursive=True):
+            if child.pid in self.excluded:
+                continue
+            try:
+                with child.oneshot():
+                    rss += child.memory_info().rss
+                    times = child.cpu_times()
+                    cpu += times.user + times.system
+                    threads += child.num_threads()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return rss, cpu, threads
+
+    def run(self):
+        try:
+            self.sample_until_stopped()
+        except Exception:
+            # the thread would otherwise die silently, losing all batches
+            logger.exception("Resource sampling failed, keeping the samples so far")
+
+        if self.samples:
+            self.batches.append(self.samples)
+            self.samples = []
+
+    def sample_until_stopped(self):
+        start = last_time = time.monotonic()
+        last_cpu = 0.0
+
+        while True:
+            rss, cpu, threads = self.sample()
+            now = time.monotonic()
+
+            # CPU time of exited processes is lost, so it may go backwards
+            elapsed = max(now - last_time, 1e-6)
+            utilization = max(cpu - last_cpu, 0.0) / elapsed
+            last_time, last_cpu = now, cpu
+
+            self.samples.append(
+                (
+                    int((now - start) * 1000),
+                    rss // 1024,
+                    int(utilization * 1000),
+                    threads,
+                )
+            )
+            if len(self.samples) >= self.batch_size:
+                self.batches.append(self.samples)
+                self.samples = []
+
+            if self.stopped.wait(self.interval):
+                break
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    @staticmethod
+    def is_available():
+        if psutil is None:
+            logger.warning(
+                "You may need to install the `psutil` extra to sample resource usage."
+            )
+        return psutil is not None
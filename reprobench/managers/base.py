@@ -13,6 +13,12 @@ class BaseManager(object):
         self.config = read_config(config, resolve_files=True)
         self.output_dir = kwargs.pop("output_dir")
         self.repeat = kwargs.pop("repeat")
+        # passed on to the workers, see `reprobench worker`
+        self.worker_options = dict(
+            profile_dir=kwargs.pop("profile_dir"),
+            profile_runs=kwargs.pop("profile_runs"),
+            cache_dir=kwargs.pop("cache_dir"),
+        )
 
         context = zmq.Context()
         self.socket = context.socket(zmq.DEALER)
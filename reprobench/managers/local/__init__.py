@@ -3,17 +3,41 @@ from multiprocessing import cpu_count
 import click
 from loguru import logger
 
-from reprobench.console.decorators import server_info, common, use_tunneling
+from reprobench.console.decorators import (
+    common,
+    server_info,
+    use_tunneling,
+    worker_options,
+)
 
 from .manager import LocalManager
 
 
 @click.command("local")
 @click.option("-w", "--num-workers", type=int, default=cpu_count(), show_default=True)
+@click.option(
+    "--pin/--no-pin",
+    default=True,
+    show_default=True,
+    help="Pin each run to a disjoint set of cores",
+)
+@click.option(
+    "--smt/--no-smt",
+    default=False,
+    show_default=True,
+    help="Use all hardware threads of a core for pinned runs",
+)
+@click.option(
+    "--memory-budget",
+    type=int,
+    default=None,
+    help="Memory (MB) shared by concurrent runs [default: 90% of physical memory]",
+)
 @click.option(
     "-d", "--output-dir", type=click.Path(), default="./output", show_default=True
 )
 @click.option("-r", "--repeat", type=int, default=1)
+@worker_options
 @click.argument("command", type=click.Choice(("run",)))
 @click.argument("config", type=click.Path(), default="./benchmark.yml")
 @server_info
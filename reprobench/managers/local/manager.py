@@ -1,27 +1,84 @@
 import atexit
+import os
+import signal
 import time
-import sys
-from multiprocessing import Pool
 
-from sshtunnel import SSHTunnelForwarder
 from loguru import logger
 from tqdm import tqdm
 
-from reprobench.core.worker import BenchmarkWorker
+from reprobench.core.events import MANAGER_SUBSCRIBE, RUN_INTERRUPT
+from reprobench.core.tunnel import open_tunnel
+from reprobench.core.worker import BenchmarkWorker, exit_on_signal
 from reprobench.managers.base import BaseManager
+from reprobench.utils import decode_message, send_event
+
+from .resources import MemoryBudget, get_memory_pressure, get_physical_memory
+from .supervisor import WorkerSupervisor
+from .topology import allocate_core_sets, get_available_cpus
+
+# learned peaks are padded, as they only cover the runs finished so far
+MEMORY_PEAK_MARGIN = 1.2
+
+POLL_INTERVAL = 500
+
+
+def get_memory_demand(run):
+    """Estimate the memory (MB) a run needs from its learned peak (KiB)"""
+    limit = float(run["limits"]["memory"])
+    peak = run.get("memory_peak")
+    if peak is None:
+        return limit
+    return min(limit, peak / 1024 * MEMORY_PEAK_MARGIN)
+
+
+def run_worker(
+    stop, current_run, server_address, cpus, pin, memory_budget, worker_options
+):
+    """Process runs until the server has none left or `stop` is set"""
+    # unwinding on terminate lets the executor kill and clean up the current
+    # run, whose tool may be in a session or cgroup of its own
+    signal.signal(signal.SIGTERM, exit_on_signal)
+
+    # every run of this worker uses its own set of cores
+    if pin:
+        os.sched_setaffinity(0, cpus)
+
+    worker = BenchmarkWorker(server_address, **worker_options)
+    worker.connect()
+    while not stop.is_set():
+        run = worker.request_run()
+        if run is None:
+            break
+
+        current_run.value = run["id"].encode()
+        # a run is only admitted once its memory fits next to the others
+        with memory_budget.reserve(get_memory_demand(run)):
+            before = get_memory_pressure()
+            worker.process_run(run)
+            after = get_memory_pressure()
+        current_run.value = b""
+
+        deltas = {key: after[key] - before[key] for key in after}
+        message = f"Memory pressure during {run['id']}: {deltas}"
+        if any(deltas.values()):
+            logger.info(message)
+        else:
+            logger.debug(message)
 
 
 class LocalManager(BaseManager):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.num_workers = kwargs.pop("num_workers")
+        self.pin = kwargs.pop("pin")
+        self.smt = kwargs.pop("smt")
+        self.memory_budget = kwargs.pop("memory_budget")
         self.start_time = None
-        self.workers = []
+        self.supervisor = None
 
     def exit(self):
-        for worker in self.workers:
-            worker.terminate()
-            worker.join()
+        if self.supervisor is not None:
+            self.supervisor.terminate()
 
         logger.info(f"Total time elapsed: {time.perf_counter() - self.start_time}")
 
@@ -29,40 +86,75 @@ class LocalManager(BaseManager):
         atexit.register(self.exit)
         self.start_time = time.perf_counter()
         if self.tunneling is not None:
-            self.server = SSHTunnelForwarder(
-                self.tunneling["host"],
-                remote_bind_address=("127.0.0.1", self.tunneling["port"]),
-                ssh_pkey=self.tunneling["key_file"],
-                ssh_config_file=self.tunneling["ssh_config_file"],
-            )
-
-            # https://github.com/pahaz/sshtunnel/issues/138
-            if sys.version_info[0] > 3 or (
-                sys.version_info[0] == 3 and sys.version_info[1] >= 7
-            ):
-                self.server.daemon_forward_servers = True
-
-            self.server.start()
+            self.server = open_tunnel(self.tunneling)
             self.server_address = f"tcp://127.0.0.1:{self.server.local_bind_port}"
-            logger.info(f"Tunneling established at {self.server_address}")
 
-    @staticmethod
-    def spawn_worker(server_address):
-        worker = BenchmarkWorker(server_address)
-        worker.run()
+    def interrupt_run(self, slot, run_id):
+        if run_id is not None:
+            send_event(self.socket, RUN_INTERRUPT, run_id)
 
     def spawn_workers(self):
-        self.pool = Pool(self.num_workers)
-        jobs = (self.server_address for _ in range(self.pending))
-        self.pool_iterator = self.pool.imap_unordered(self.spawn_worker, jobs)
-        self.pool.close()
+        cores_per_run = int(self.config["limits"].get("cores", 1))
+        pin = self.pin and hasattr(os, "sched_setaffinity")
+        available = allocate_core_sets(cores_per_run, smt=self.smt or not pin)
+        available = available[: self.num_workers]
+        if len(available) == 0:
+            logger.warning(f"Not enough cores for runs with {cores_per_run} cores")
+            available = [get_available_cpus()]
+        logger.info(
+            f"Running {len(available)} concurrent runs of {cores_per_run} cores"
+        )
+        logger.debug(f"Core sets: {available}")
+
+        budget = self.memory_budget
+        if budget is None:
+            budget = 0.9 * get_physical_memory() / (1024 * 1024)
+        logger.info(f"Admitting runs within a memory budget of {budget:.0f} MB")
+        memory_budget = MemoryBudget(budget)
+
+        # progress is reported by the server as runs finish
+        send_event(self.socket, MANAGER_SUBSCRIBE)
+        decode_message(self.socket.recv())
+
+        slots = [
+            (self.server_address, cpus, pin, memory_budget, self.worker_options)
+            for cpus in available[: max(self.pending, 1)]
+        ]
+        self.supervisor = WorkerSupervisor(
+            run_worker, slots, on_crash=self.interrupt_run
+        )
+        self.supervisor.start()
+
+    def handle_sigint(self, signum, frame):
+        if self.supervisor.stop.is_set():
+            raise KeyboardInterrupt
+        logger.warning("Finishing the current runs, press Ctrl-C again to abort")
+        self.supervisor.drain()
+
+    def report_progress(self, progress_bar):
+        message = decode_message(self.socket.recv())
+        if message.get("canceled", 0) > 0:
+            # runs of parameter groups eliminated by racing
+            progress_bar.total -= message["canceled"]
+            progress_bar.refresh()
+        progress_bar.update()
 
     def wait(self):
+        signal.signal(signal.SIGINT, self.handle_sigint)
         progress_bar = tqdm(desc="Executing runs", total=self.pending)
-        for _ in self.pool_iterator:
-            progress_bar.update()
+
+        try:
+            while self.supervisor.check():
+                if self.socket.poll(POLL_INTERVAL):
+                    self.report_progress(progress_bar)
+        except KeyboardInterrupt:
+            self.supervisor.terminate()
+
+        # the last runs may be reported after their workers exited
+        while progress_bar.n < progress_bar.total and self.socket.poll(POLL_INTERVAL):
+            self.report_progress(progress_bar)
         progress_bar.close()
-        self.pool.join()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
 
         if self.tunneling is not None:
             self.server.stop()
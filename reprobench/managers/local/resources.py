@@ -0,0 +1,76 @@
+import math
+import os
+from contextlib import contextmanager
+from multiprocessing import Condition, Value
+from pathlib import Path
+
+PRESSURE_FILE = Path("/proc/pressure/memory")
+VMSTAT_FILE = Path("/proc/vmstat")
+
+
+def get_physical_memory():
+    """Get the physical memory of this machine in bytes"""
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def get_memory_pressure():
+    """Get the cumulative memory pressure of this machine
+
+    Returns:
+        dict: total time (us) tasks were stalled on memory (`stall`) and the
+        number of pages swapped in and out (`swap`). Counters not exposed by
+        the kernel are missing.
+    """
+    pressure = {}
+
+    try:
+        for line in PRESSURE_FILE.read_text().splitlines():
+            kind, *fields = line.split()
+            if kind == "some":
+                total = dict(field.split("=") for field in fields)["total"]
+                pressure["stall"] = int(total)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    try:
+        vmstat = dict(line.split() for line in VMSTAT_FILE.read_text().splitlines())
+        pressure["swap"] = int(vmstat["pswpin"]) + int(vmstat["pswpout"])
+    except (OSError, KeyError, ValueError):
+        pass
+
+    return pressure
+
+
+class MemoryBudget:
+    """Memory shared by concurrently admitted runs on this machine
+
+    Shared between processes, so it has to be created before the pool of
+    workers and handed to them on initialization.
+
+    Args:
+        total (int): the budget in MB
+    """
+
+    def __init__(self, total):
+        self.total = int(total)
+        self.used = Value("q", 0, lock=False)
+        self.condition = Condition()
+
+    @contextmanager
+    def reserve(self, amount):
+        """Block until `amount` MB are available and hold them
+
+        A demand larger than the whole budget is capped at the budget, so it
+        is admitted once nothing else is running.
+        """
+        amount = min(int(math.ceil(amount)), self.total)
+        with self.condition:
+            self.condition.wait_for(lambda: self.used.value + amount <= self.total)
+            self.used.value += amount
+
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.used.value -= amount
+                self.condition.notify_all()
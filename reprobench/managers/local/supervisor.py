@@ -0,0 +1,153 @@
+import os
+import signal
+import time
+from multiprocessing import Array, Event, Process
+
+from loguru import logger
+
+
+def run_in_group(target, *args):
+    """Run `target` in a process group of its own
+
+    The terminal sends Ctrl-C to its foreground process group, which then
+    reaches neither the worker nor the runs it starts. They keep the default
+    SIGINT handler, and stopping them is left to the supervisor.
+    """
+    os.setpgrp()
+    target(*args)
+
+
+class WorkerSupervisor:
+    """Keep a fixed number of long-lived worker processes running
+
+    Each slot runs `target(stop, current_run, *args)` in its own process.
+    A worker exiting with 0 is done, while a crashed one is reported to
+    `on_crash` with the id of the run it was processing (if any) and
+    restarted after an exponential backoff, until it crashed `max_crashes`
+    times in a row. Setting `stop` asks the workers to finish their current
+    run and exit. Each worker runs in its own process group, which is sent
+    SIGTERM on `terminate` and killed if it did not exit within
+    `TERMINATE_TIMEOUT`, so workers can clean up runs outside of their group.
+
+    Args:
+        target (callable): the worker function
+        slots (list): the arguments of the worker of each slot
+        on_crash (callable, optional): called with the slot and run id
+        max_crashes (int, optional): consecutive crashes before giving up
+    """
+
+    BACKOFF_MAX = 60
+    # a worker living that long is not crashing in a loop
+    STABLE_UPTIME = 60
+    RUN_ID_SIZE = 4096
+    TERMINATE_TIMEOUT = 30
+
+    def __init__(self, target, slots, on_crash=None, max_crashes=5):
+        self.target = target
+        self.slots = slots
+        self.on_crash = on_crash
+        self.max_crashes = max_crashes
+
+        self.stop = Event()
+        self.current_runs = [Array("c", self.RUN_ID_SIZE) for _ in slots]
+        self.processes = [None] * len(slots)
+        self.started_at = [None] * len(slots)
+        self.restart_at = [None] * len(slots)
+        self.crashes = [0] * len(slots)
+
+    def start_worker(self, slot):
+        self.current_runs[slot].value = b""
+        process = Process(
+            target=run_in_group,
+            args=(self.target, self.stop, self.current_runs[slot], *self.slots[slot]),
+        )
+        process.start()
+        self.processes[slot] = process
+        self.started_at[slot] = time.monotonic()
+        self.restart_at[slot] = None
+
+    def start(self):
+        for slot in range(len(self.slots)):
+            self.start_worker(slot)
+
+    def handle_exit(self, slot):
+        process = self.processes[slot]
+        self.processes[slot] = None
+        if process.exitcode == 0:
+            return
+
+        run_id = self.current_runs[slot].value.decode() or None
+        logger.error(f"Worker {slot} crashed with {process.exitcode} on {run_id}")
+        if self.on_crash is not None:
+            self.on_crash(slot, run_id)
+
+        if time.monotonic() - self.started_at[slot] > self.STABLE_UPTIME:
+            self.crashes[slot] = 0
+        self.crashes[slot] += 1
+
+        if self.stop.is_set():
+            return
+        if self.crashes[slot] > self.max_crashes:
+            logger.error(f"Worker {slot} keeps crashing, giving up on it")
+            return
+
+        backoff = min(2 ** (self.crashes[slot] - 1), self.BACKOFF_MAX)
+        logger.info(f"Restarting worker {slot} in {backoff}s")
+        self.restart_at[slot] = time.monotonic() + backoff
+
+    def check(self):
+        """Reap exited workers and restart crashed ones when due
+
+        Returns:
+            bool: whether any worker is still running or to be restarted
+        """
+        now = time.monotonic()
+        for slot, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                process.join()
+                self.handle_exit(slot)
+            if self.restart_at[slot] is not None:
+                if self.stop.is_set():
+                    self.restart_at[slot] = None
+                elif now >= self.restart_at[slot]:
+                    self.start_worker(slot)
+
+        return any(
+            process is not None or restart is not None
+            for process, restart in zip(self.processes, self.restart_at)
+        )
+
+    def drain(self):
+        """Let the workers finish their current run, then exit"""
+        self.stop.set()
+
+    def terminate(self):
+        """Kill the workers, reporting their current runs as crashed"""
+        self.stop.set()
+        running = [
+            (slot, process)
+            for slot, process in enumerate(self.processes)
+            if process is not None
+        ]
+        for _, process in running:
+            self.kill_group(process, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.TERMINATE_TIMEOUT
+        for slot, process in running:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(f"Worker {slot} did not exit in time, killing it")
+                self.kill_group(process, signal.SIGKILL)
+                process.join()
+            self.handle_exit(slot)
+
+    @staticmethod
+    def kill_group(process, signum):
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            # not in its own process group yet
+            if signum == signal.SIGKILL:
+                process.kill()
+            else:
+                process.terminate()
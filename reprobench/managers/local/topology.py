@@ -0,0 +1,112 @@
+import os
+from collections import OrderedDict
+from itertools import groupby
+from multiprocessing import cpu_count
+from pathlib import Path
+
+SYSFS_CPU = Path("/sys/devices/system/cpu")
+SYSFS_NODE = Path("/sys/devices/system/node")
+
+
+def parse_cpu_list(cpu_list):
+    """Parse a CPU list as used in sysfs
+
+    Args:
+        cpu_list (str): CPU list, e.g. "0-3,8"
+
+    Returns:
+        [int]: the listed CPUs
+
+    Examples:
+        >>> parse_cpu_list("0-3,8")
+        [0, 1, 2, 3, 8]
+    """
+    cpus = []
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def _read_int(path, default):
+    try:
+        return int(path.read_text())
+    except (OSError, ValueError):
+        return default
+
+
+def get_available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(cpu_count()))
+
+
+def get_cpu_topology():
+    """Get the topology of the CPUs this process may run on
+
+    Topology that is not visible (e.g. in containers or on non-Linux systems)
+    is reported as a single NUMA node with one physical core per CPU.
+
+    Returns:
+        [(int, int, int, int)]: (node, package, core, cpu) for each CPU
+    """
+    nodes = {}
+    for node_dir in SYSFS_NODE.glob("node[0-9]*"):
+        try:
+            node_cpus = parse_cpu_list((node_dir / "cpulist").read_text())
+        except OSError:
+            continue
+        for cpu in node_cpus:
+            nodes[cpu] = int(node_dir.name[len("node") :])
+
+    topology = []
+    for cpu in get_available_cpus():
+        cpu_dir = SYSFS_CPU / f"cpu{cpu}" / "topology"
+        package = _read_int(cpu_dir / "physical_package_id", 0)
+        core = _read_int(cpu_dir / "core_id", cpu)
+        topology.append((nodes.get(cpu, 0), package, core, cpu))
+
+    return sorted(topology)
+
+
+def allocate_core_sets(cores_per_run, smt=False, topology=None):
+    """Partition the available CPUs into disjoint sets for concurrent runs
+
+    Sets are filled with cores of the same NUMA node first, only the
+    leftovers of all nodes are combined into sets spanning nodes. Unless
+    `smt` is enabled, only one hardware thread of each physical core is used
+    so that concurrent runs do not compete for the same core.
+
+    Args:
+        cores_per_run (int): number of cores in each set
+        smt (bool, optional): use all hardware threads. Defaults to False.
+        topology (list, optional): result of `get_cpu_topology`
+
+    Returns:
+        [[int]]: the CPU sets
+    """
+    if topology is None:
+        topology = get_cpu_topology()
+
+    units_per_node = OrderedDict()
+    for node, threads in groupby(topology, key=lambda cpu: cpu[0]):
+        units = []
+        for _, siblings in groupby(threads, key=lambda cpu: cpu[1:3]):
+            siblings = [cpu for (*_, cpu) in siblings]
+            units.extend([[cpu] for cpu in siblings] if smt else [siblings[:1]])
+        units_per_node[node] = units
+
+    core_sets = []
+    leftovers = []
+    for units in units_per_node.values():
+        whole = len(units) - len(units) % cores_per_run
+        for i in range(0, whole, cores_per_run):
+            core_sets.append(sum(units[i : i + cores_per_run], []))
+        leftovers.extend(units[whole:])
+
+    for i in range(0, len(leftovers) - cores_per_run + 1, cores_per_run):
+        core_sets.append(sum(leftovers[i : i + cores_per_run], []))
+
+    return core_sets
@@ -1,16 +1,76 @@
 import click
 
-from reprobench.console.decorators import common, server_info, use_tunneling
+from reprobench.console.decorators import (
+    common,
+    server_info,
+    use_tunneling,
+    worker_options,
+)
 from reprobench.utils import read_config
 
 from .manager import SlurmManager
 
 
 @click.command("slurm")
+@click.option(
+    "--runs-per-task",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of runs processed by each array task",
+)
+@click.option(
+    "--exclusive-nodes",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Use this many node-exclusive jobs with a worker per core slot instead",
+)
+@click.option(
+    "--slots-per-node",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Workers per exclusive node [default: node CPUs / cores per run]",
+)
+@click.option(
+    "--estimate-quantile",
+    type=click.FloatRange(0, 1),
+    default=0.95,
+    show_default=True,
+    help="Quantile of past wall times to size jobs with",
+)
+@click.option(
+    "--estimate-margin",
+    type=click.FloatRange(min=1),
+    default=1.25,
+    show_default=True,
+    help="Safety factor applied to the estimated wall time",
+)
+@click.option(
+    "--monitor/--no-monitor",
+    default=True,
+    show_default=True,
+    help="Follow the jobs until all runs are done, resubmitting failed ones",
+)
+@click.option(
+    "--poll-interval",
+    type=click.FloatRange(min=5),
+    default=30,
+    show_default=True,
+    help="Seconds between polls of the job states",
+)
+@click.option(
+    "--max-resubmits",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="Number of times runs of failed jobs are resubmitted",
+)
 @click.option(
     "-d", "--output-dir", type=click.Path(), default="./output", show_default=True
 )
 @click.option("-r", "--repeat", type=int, default=1)
+@worker_options
 @click.argument("command", type=click.Choice(("run", "stop")))
 @click.argument("config", type=click.Path(), default="./benchmark.yml")
 @server_info
@@ -1,49 +1,151 @@
 import math
+import shlex
 import subprocess
 import sys
 from pathlib import Path
 
 from loguru import logger
 
-from sshtunnel import SSHTunnelForwarder
+from reprobench.core.events import RUN_ESTIMATES
+from reprobench.core.tunnel import open_tunnel
+from reprobench.core.worker import RUN_TIME_SLACK
 from reprobench.managers.base import BaseManager
-from reprobench.utils import read_config
+from reprobench.utils import decode_message, read_config, send_event
 
+from .monitor import SlurmMonitor
 from .utils import to_comma_range
 
 
 class SlurmManager(BaseManager):
+    # finished runs of a tool needed before trusting its statistics
+    MIN_SAMPLES = 10
+    # time (s) for a job to start its worker and connect to the server
+    JOB_STARTUP = 60
+    # memory (MB) of the worker on top of the run
+    WORKER_MEMORY = 256
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.runs_per_task = kwargs.pop("runs_per_task")
+        self.exclusive_nodes = kwargs.pop("exclusive_nodes")
+        self.slots_per_node = kwargs.pop("slots_per_node")
+        self.estimate_quantile = kwargs.pop("estimate_quantile")
+        self.estimate_margin = kwargs.pop("estimate_margin")
+        self.monitor = kwargs.pop("monitor")
+        self.poll_interval = kwargs.pop("poll_interval")
+        self.max_resubmits = kwargs.pop("max_resubmits")
+
     def prepare(self):
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
         limits = self.config["limits"]
-        time_limit_minutes = int(math.ceil(limits["time"] / 60.0))
-
         self.cpu_count = limits.get("cores", 1)
-        # @TODO improve this
-        self.time_limit = 2 * time_limit_minutes
-        self.mem_limit = 2 * limits["memory"]
 
         if self.tunneling is not None:
-            self.server = SSHTunnelForwarder(
-                self.tunneling["host"],
-                remote_bind_address=("127.0.0.1", self.tunneling["port"]),
-                ssh_pkey=self.tunneling["key_file"],
-                ssh_config_file=self.tunneling["ssh_config_file"],
-            )
-
-            # https://github.com/pahaz/sshtunnel/issues/138
-            if sys.version_info[0] > 3 or (
-                sys.version_info[0] == 3 and sys.version_info[1] >= 7
-            ):
-                self.server.daemon_forward_servers = True
-
-            self.server.start()
+            self.server = open_tunnel(self.tunneling)
             self.server_address = f"tcp://127.0.0.1:{self.server.local_bind_port}"
-            logger.info(f"Tunneling established at {self.server_address}")
 
     def stop(self):
         subprocess.run(["scancel", f"--name={self.config['title']}-benchmark-worker"])
 
+    def estimate_run_time(self):
+        """Estimate the wall time (s) of the pending runs
+
+        Returns the worst case over all tools of the `estimate_quantile` of
+        their finished runs, padded by `estimate_margin`. Tools with too few
+        finished runs are assumed to use their whole time limit.
+
+        The memory of the jobs is not estimated: any run may use up to the
+        memory limit enforced by its executor, and a job exceeding its
+        memory is killed along with all its runs.
+        """
+        run_time_limit = self.config["limits"]["time"] + RUN_TIME_SLACK
+
+        payload = dict(quantile=self.estimate_quantile)
+        send_event(self.socket, RUN_ESTIMATES, payload)
+        estimates = decode_message(self.socket.recv())
+
+        run_time = 0
+        for tool, estimate in estimates.items():
+            if estimate["samples"] < self.MIN_SAMPLES or estimate["wall_time"] is None:
+                logger.debug(f"Not enough finished runs of {tool} for estimates")
+                return run_time_limit
+
+            wall_time = estimate["wall_time"] * self.estimate_margin
+            run_time = max(run_time, wall_time + RUN_TIME_SLACK)
+
+        return min(run_time, run_time_limit)
+
+    def get_job_time(self, runs):
+        """Wall time (s) of a worker processing `runs` runs one after another
+
+        Every job can finish at least one run within its limits, the worker
+        hands back runs that it would not be able to finish in time.
+        """
+        run_time_limit = self.config["limits"]["time"] + RUN_TIME_SLACK
+        return run_time_limit + (runs - 1) * self.run_time
+
+    def get_time_args(self, job_time):
+        minutes = int(math.ceil((job_time + self.JOB_STARTUP) / 60.0))
+        return [f"--time={minutes}"], f"--time-budget={int(job_time)}"
+
+    def get_array_submit_args(self, worker_cmd, runs):
+        """One array task per `runs_per_task` runs, each a single worker"""
+        tasks = int(math.ceil(runs / self.runs_per_task))
+        time_args, budget_arg = self.get_time_args(
+            self.get_job_time(self.runs_per_task)
+        )
+        mem = int(math.ceil(self.config["limits"]["memory"] + self.WORKER_MEMORY))
+        return [
+            f"--array=1-{tasks}",
+            *time_args,
+            f"--mem={mem}",
+            f"--cpus-per-task={self.cpu_count}",
+            f"--output={self.output_dir}/slurm-worker_%A_%a.out",
+            "--wrap",
+            f"srun {worker_cmd} --max-runs={self.runs_per_task} {budget_arg}",
+        ]
+
+    def get_exclusive_submit_args(self, worker_cmd, runs):
+        """Whole nodes running one worker per core slot until the queue drains
+
+        At most `exclusive_nodes` nodes are used, fewer when `runs` does not
+        fill them (e.g. when resubmitting a few runs).
+        """
+        # nodes have at least one slot when their number of slots is unknown
+        slots = self.slots_per_node or 1
+        nodes = min(self.exclusive_nodes, int(math.ceil(runs / slots)))
+        submit_args = [
+            f"--array=1-{nodes}",
+            "--nodes=1",
+            "--exclusive",
+            "--mem=0",
+            f"--output={self.output_dir}/slurm-worker_%A_%a.out",
+        ]
+
+        budget_arg = ""
+        if self.slots_per_node is not None:
+            runs_per_slot = math.ceil(runs / (nodes * slots))
+            time_args, budget_arg = self.get_time_args(self.get_job_time(runs_per_slot))
+            submit_args.extend(time_args)
+        else:
+            # only known once the node is allocated, the time limit is left
+            # to the partition default
+            slots = f"$((SLURM_CPUS_ON_NODE / {self.cpu_count}))"
+
+        srun_cmd = (
+            f"srun --ntasks={slots} --cpus-per-task={self.cpu_count} "
+            f"{worker_cmd} --max-runs=0 {budget_arg}"
+        )
+        return [*submit_args, "--wrap", srun_cmd.strip()]
+
+    def get_worker_args(self):
+        """Command line arguments of the workers for `worker_options`"""
+        return [
+            f"--{name.replace('_', '-')}={shlex.quote(str(value))}"
+            for name, value in self.worker_options.items()
+            if value is not None
+        ]
+
     def spawn_workers(self):
         logger.info("Spawning workers...")
 
@@ -51,24 +153,46 @@ class SlurmManager(BaseManager):
         if self.tunneling is not None:
             address_args = f"-h {self.tunneling['host']} -p {self.tunneling['port']} -K {self.tunneling['key_file']}"
 
-        worker_cmd = f"{sys.exec_prefix}/bin/reprobench worker {address_args} -vv"
+        self.worker_cmd = " ".join(
+            [
+                f"{sys.exec_prefix}/bin/reprobench worker {address_args} -vv",
+                *self.get_worker_args(),
+            ]
+        )
+
+        self.run_time = self.estimate_run_time()
+        logger.info(f"Sizing jobs for runs of {self.run_time:.0f}s")
+
+        self.jobs = [self.submit_workers(self.pending)]
+
+    def submit_workers(self, runs):
+        """Submit a job array processing `runs` runs
+
+        Returns:
+            str: the job id of the array
+        """
+        if self.exclusive_nodes > 0:
+            submit_args = self.get_exclusive_submit_args(self.worker_cmd, runs)
+        else:
+            submit_args = self.get_array_submit_args(self.worker_cmd, runs)
+
         worker_submit_cmd = [
             "sbatch",
             "--parsable",
-            f"--array=1-{self.pending}",
-            f"--time={self.time_limit}",
-            f"--mem={self.mem_limit}",
-            f"--cpus-per-task={self.cpu_count}",
             f"--job-name={self.config['title']}-benchmark-worker",
-            f"--output={self.output_dir}/slurm-worker_%a.out",
-            "--wrap",
-            f"srun {worker_cmd}",
+            *submit_args,
         ]
         logger.trace(worker_submit_cmd)
-        self.worker_job = subprocess.check_output(worker_submit_cmd).decode().strip()
-        logger.info(f"Worker job array id: {self.worker_job}")
+        output = subprocess.check_output(worker_submit_cmd).decode().strip()
+        # --parsable prints "<job id>[;<cluster>]"
+        worker_job = output.split(";")[0]
+        logger.info(f"Worker job array id: {worker_job}")
+        return worker_job
 
     def wait(self):
+        if self.monitor:
+            SlurmMonitor(self, self.poll_interval, self.max_resubmits).run()
+
         if self.tunneling is not None:
             self.server.stop()
 
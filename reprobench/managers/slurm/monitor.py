@@ -0,0 +1,112 @@
+import subprocess
+import time
+
+from loguru import logger
+from tqdm import tqdm
+
+from reprobench.core.events import RUN_RECONCILE
+from reprobench.utils import decode_message, send_event
+
+from .utils import get_job_states
+
+ACTIVE_STATES = (
+    "PENDING",
+    "CONFIGURING",
+    "RUNNING",
+    "COMPLETING",
+    "RESIZING",
+    "REQUEUED",
+    "SUSPENDED",
+)
+
+
+class SlurmMonitor:
+    """Follow the worker jobs of a Slurm manager until all runs are done
+
+    Every `poll_interval` seconds, the states of all jobs are fetched with a
+    single `sacct` call and sent to the server, which resets the unfinished
+    runs of jobs that are gone. Those runs are resubmitted in a new job
+    array, at most `max_resubmits` times. The runs handed back by workers
+    running out of time are not failures, and are always resubmitted.
+
+    Args:
+        manager (SlurmManager): the manager that submitted the jobs
+        poll_interval (float): seconds between polls
+        max_resubmits (int): number of resubmissions allowed
+    """
+
+    def __init__(self, manager, poll_interval, max_resubmits):
+        self.manager = manager
+        self.poll_interval = poll_interval
+        self.max_resubmits = max_resubmits
+        self.resubmits = 0
+        self.finished_jobs = set()
+
+    def reconcile(self, jobs, orphans=False):
+        payload = dict(jobs=list(jobs), orphans=orphans)
+        send_event(self.manager.socket, RUN_RECONCILE, payload)
+        return decode_message(self.manager.socket.recv())
+
+    def poll(self):
+        """Reconcile the runs with the job states
+
+        Returns:
+            dict: the run counts reported by the server
+        """
+        try:
+            states = get_job_states(self.manager.jobs)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Could not get the job states: {e}")
+            states = {}
+
+        finished = {
+            job_id for job_id, state in states.items() if state not in ACTIVE_STATES
+        }
+        for job_id in sorted(finished - self.finished_jobs):
+            logger.debug(f"Job {job_id} is {states[job_id]}")
+
+        # jobs not listed yet have just been submitted
+        listed = {
+            job
+            for job in self.manager.jobs
+            if any(key == job or key.startswith(f"{job}_") for key in states)
+        }
+        alive = len(listed) < len(set(self.manager.jobs)) or len(finished) < len(states)
+        result = self.reconcile(finished - self.finished_jobs, orphans=not alive)
+        self.finished_jobs |= finished
+
+        if result["reset"] > 0:
+            logger.warning(f"Reset {result['reset']} runs of finished jobs")
+        if result["interrupted"] > 0:
+            logger.info(f"{result['interrupted']} runs were handed back by workers")
+
+        failed = result["reset"]
+        exhausted = failed > 0 and self.resubmits >= self.max_resubmits
+        if failed > 0 and not exhausted:
+            self.resubmits += 1
+
+        resubmit = result["interrupted"]
+        if not exhausted:
+            resubmit += failed
+            if not alive:
+                resubmit = result["pending"]
+        if resubmit > 0:
+            logger.info(f"Resubmitting {resubmit} runs")
+            self.manager.jobs.append(self.manager.submit_workers(resubmit))
+        elif exhausted and not alive:
+            logger.error(f"Giving up on {result['pending']} unfinished runs")
+            result["pending"] = 0
+
+        return result
+
+    def run(self):
+        progress_bar = tqdm(desc="Executing runs")
+        while True:
+            result = self.poll()
+            progress_bar.total = result["total"]
+            progress_bar.update(result["done"] - progress_bar.n)
+
+            if result["pending"] == 0 and result["active"] == 0:
+                break
+            time.sleep(self.poll_interval)
+        progress_bar.close()
@@ -1,4 +1,5 @@
 import subprocess
+import time
 from itertools import groupby
 from operator import itemgetter
 
@@ -14,12 +15,37 @@ def to_comma_range(it):
     )
 
 
-def get_nodelist(job_step):
+def get_nodelist(job_step, interval=1):
     """
-    Blocks until job step is assigned a node
+    Blocks until job step is assigned a node, polling every `interval` seconds
     """
     while True:
         cmd = ["sacct", "-n", "--parsable2", "-j", job_step, "-o", "NodeList"]
         output = subprocess.check_output(cmd)
         if len(output) > 0 and output != b"None assigned\n":
             return output.decode().strip()
+        time.sleep(interval)
+
+
+def get_job_states(job_ids):
+    """Get the states of the jobs and array tasks of some jobs in one call
+
+    Args:
+        job_ids (list): ids of the jobs (or job arrays)
+
+    Returns:
+        dict: the state of each job or array task, by its sacct job id
+        (e.g. `123_4`, or `123_[5-9]` for array tasks not started yet)
+    """
+    cmd = ["sacct", "-n", "--parsable2", "-X", "-o", "JobID,State"]
+    cmd.extend(["-j", ",".join(job_ids)])
+    output = subprocess.check_output(cmd).decode()
+
+    states = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        job_id, state = line.split("|")[:2]
+        # e.g. "CANCELLED by 1000"
+        states[job_id] = state.split()[0] if state.strip() else "PENDING"
+    return states
@@ -0,0 +1,100 @@
+import json
+import os
+from pathlib import Path
+
+try:
+    from peewee import SQL, DatabaseError, fn
+except ImportError:
+    pass
+
+ANALYSIS_CACHE = "analysis_cache.json"
+
+# columns updated in place, which change neither the row count nor the rowids
+IN_PLACE_FIELDS = ("status", "last_step", "tool_version")
+
+
+def get_watermark(models):
+    """Get a watermark of the content of the tables of `models`
+
+    The watermark of a table is its row count and largest rowid, which both
+    change with inserted, replaced or deleted rows, and the count of rows by
+    value of the columns of `IN_PLACE_FIELDS` it has, which runs update in
+    place (e.g. a rerun with a new tool version). Updates in place of other
+    columns are not seen. It is None for missing tables.
+
+    Returns:
+        dict: the watermark of each table
+    """
+    watermark = {}
+    for model in models:
+        try:
+            mark = list(
+                model.select(fn.COUNT(SQL("*")), fn.MAX(SQL("rowid"))).tuples().get()
+            )
+            fields = [
+                model._meta.fields[name]
+                for name in IN_PLACE_FIELDS
+                if name in model._meta.fields
+            ]
+            if len(fields) > 0:
+                counts = model.select(*fields, fn.COUNT(SQL("*"))).group_by(*fields)
+                # the values may be None
+                mark.append(sorted(counts.tuples(), key=json.dumps))
+        except DatabaseError:
+            mark = None
+        watermark[model._meta.table_name] = mark
+
+    # as read back from the cache file
+    return json.loads(json.dumps(watermark))
+
+
+class AnalysisCache:
+    """Watermarks of the database at the last execution of analysis steps
+
+    A step is keyed by its module and config. It can be skipped when the
+    watermark of its inputs did not change since it last ran and its output
+    still exists. Steps not declaring their inputs are never skipped.
+
+    Args:
+        output_dir (str): the output directory of the benchmark
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.cache_path = self.output_dir / ANALYSIS_CACHE
+        try:
+            self.entries = json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def get_key(module, config):
+        return json.dumps([module, config], sort_keys=True, default=str)
+
+    def get_previous(self, module, config):
+        """Get the watermark of the inputs when the step last ran"""
+        return self.entries.get(self.get_key(module, config))
+
+    def is_fresh(self, module, config, watermark, output=None):
+        """Whether the step can be skipped
+
+        Args:
+            output (str, optional): the output of the step, relative to the
+                output directory, which must still exist
+        """
+        if watermark is None or self.get_previous(module, config) != watermark:
+            return False
+        return output is None or (self.output_dir / output).exists()
+
+    def update(self, module, config, watermark):
+        key = self.get_key(module, config)
+        if watermark is None:
+            self.entries.pop(key, None)
+        else:
+            self.entries[key] = watermark
+
+    def save(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.cache_path.with_name(f".{self.cache_path.name}.{os.getpid()}")
+        temp_path.write_text(json.dumps(self.entries, indent=2))
+        os.replace(temp_path, self.cache_path)
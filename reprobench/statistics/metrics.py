@@ -0,0 +1,154 @@
+import numpy as np
+from peewee import JOIN
+
+from reprobench.core.db import ParameterGroup, Run
+from reprobench.executors.db import RunStatistic
+
+
+class RuntimeMatrix:
+    """The runs of each solver (tool and parameter group) on each task
+
+    All finished runs are loaded, and they are solved when their verdict is
+    OK. Failed runs, runs without statistics and timeouts under a capped
+    time limit (CAP) count as unsolved. With several iterations, a task is
+    solved by a solver at the rate of its solved runs, and its cost is the
+    mean penalized cost of the runs.
+
+    Attributes:
+        solvers (numpy.ndarray): `<tool>_<group>` label of each row
+        tasks (numpy.ndarray): path of each column
+        runs (numpy.ndarray): number of runs of each solver on each task
+        solved (numpy.ndarray): number of solved runs
+        solved_time (numpy.ndarray): summed measure of the solved runs
+    """
+
+    def __init__(self, solvers, tasks, runs, solved, solved_time):
+        self.solvers = solvers
+        self.tasks = tasks
+        self.runs = runs
+        self.solved = solved
+        self.solved_time = solved_time
+
+    @classmethod
+    def load(cls, measure="cpu_time"):
+        field = getattr(RunStatistic, measure)
+        rows = (
+            Run.select(
+                Run.tool, ParameterGroup.name, Run.task, RunStatistic.verdict, field
+            )
+            .join_from(Run, ParameterGroup)
+            .join_from(Run, RunStatistic, JOIN.LEFT_OUTER)
+            .where(Run.status.in_([Run.DONE, Run.FAILED]))
+            .tuples()
+        )
+        tools, groups, tasks, verdicts, values = (
+            zip(*rows) if rows.exists() else ([],) * 5
+        )
+
+        labels = [f"{tool}_{group}" for tool, group in zip(tools, groups)]
+        solvers, rows = np.unique(np.array(labels, dtype=str), return_inverse=True)
+        tasks, columns = np.unique(np.array(tasks, dtype=str), return_inverse=True)
+        values = np.array(values, dtype=float)
+        solved = (np.array(verdicts) == RunStatistic.SUCCESS) & ~np.isnan(values)
+
+        shape = (len(solvers), len(tasks))
+        runs = np.zeros(shape)
+        solved_runs = np.zeros(shape)
+        solved_time = np.zeros(shape)
+        np.add.at(runs, (rows, columns), 1)
+        np.add.at(solved_runs, (rows[solved], columns[solved]), 1)
+        np.add.at(solved_time, (rows[solved], columns[solved]), values[solved])
+
+        return cls(solvers, tasks, runs, solved_runs, solved_time)
+
+    def restrict(self, missing="common"):
+        """Handle the tasks some solvers have no runs on
+
+        Args:
+            missing (str, optional): "common" to keep only the tasks run by
+                all solvers, "unsolved" to count the missing runs as one
+                unsolved run. Defaults to "common".
+
+        Returns:
+            RuntimeMatrix: the matrix without missing runs
+        """
+        if missing == "unsolved":
+            runs = np.maximum(self.runs, 1)
+            return RuntimeMatrix(
+                self.solvers, self.tasks, runs, self.solved, self.solved_time
+            )
+
+        common = (self.runs > 0).all(axis=0)
+        return RuntimeMatrix(
+            self.solvers,
+            self.tasks[common],
+            self.runs[:, common],
+            self.solved[:, common],
+            self.solved_time[:, common],
+        )
+
+    def solved_rate(self):
+        """Get the fraction of solved runs of each solver on each task"""
+        return self.solved / self.runs
+
+    def par(self, k, time_limit):
+        """Get the penalized average runtime of each solver on each task
+
+        Unsolved runs cost `k` times the time limit.
+        """
+        unsolved = self.runs - self.solved
+        return (self.solved_time + unsolved * k * time_limit) / self.runs
+
+
+def virtual_best(costs):
+    """Get the cost of the virtual best solver on each task"""
+    return costs.min(axis=0)
+
+
+def marginal_contribution(costs):
+    """Get how much the virtual best solver worsens without each solver
+
+    Args:
+        costs (numpy.ndarray): (solvers, tasks) array, lower is better
+
+    Returns:
+        numpy.ndarray: increase of the mean cost of the virtual best solver
+        over the tasks when each solver is left out, NaN with one solver
+    """
+    if len(costs) < 2:
+        return np.full(len(costs), np.nan)
+
+    ranked = np.sort(costs, axis=0)
+    best = costs.argmin(axis=0)
+    without = np.where(
+        np.arange(len(costs))[:, None] == best[None, :], ranked[1], ranked[0]
+    )
+    return without.mean(axis=1) - ranked[0].mean()
+
+
+def bootstrap_ci(values, samples=1000, confidence=0.95, seed=0):
+    """Bootstrap a confidence interval of the mean over the tasks
+
+    The tasks are resampled with replacement. Each resample is drawn as
+    the number of times each task is picked, so all resamples of all rows
+    are evaluated with a single matrix product.
+
+    Args:
+        values (numpy.ndarray): (rows, tasks) array
+        samples (int, optional): number of resamples. Defaults to 1000.
+        confidence (float, optional): confidence level. Defaults to 0.95.
+        seed (int, optional): seed of the resampling. Defaults to 0.
+
+    Returns:
+        tuple: arrays of the lower and upper bounds of each row
+    """
+    rows, tasks = values.shape
+    if tasks == 0:
+        return np.full(rows, np.nan), np.full(rows, np.nan)
+
+    rng = np.random.RandomState(seed)
+    weights = rng.multinomial(tasks, np.full(tasks, 1 / tasks), size=samples)
+    means = values @ weights.T / tasks
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, (alpha, 1 - alpha), axis=1)
+    return low, high
@@ -1 +1,2 @@
 from .cactus import CactusPlot
+from .figures import CactusFigure, ECDFFigure
@@ -12,13 +12,17 @@ class NotebookExecutor(Step):
     INPUT_NOTEBOOK = None
     DEFAULT_OUTPUT = None
 
+    @classmethod
+    def get_output(cls, config=None):
+        return (config or {}).get("output", cls.DEFAULT_OUTPUT)
+
     @classmethod
     def execute(cls, context, config=None):
         if config is None:
             config = {}
 
         output_dir = context.get("output_dir", None)
-        output = Path(output_dir) / config.get("output", cls.DEFAULT_OUTPUT)
+        output = Path(output_dir) / cls.get_output(config)
         output.parent.mkdir(parents=True, exist_ok=True)
 
         parameters = dict(db_path=context.get("db_path"), **config)
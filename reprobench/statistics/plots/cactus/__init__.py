@@ -1,5 +1,7 @@
 import os
 
+from reprobench.core.db import ParameterGroup, Run
+from reprobench.executors.db import RunStatistic
 from reprobench.statistics.plots.base import NotebookExecutor
 
 DIR = os.path.dirname(__file__)
@@ -8,3 +10,4 @@ DIR = os.path.dirname(__file__)
 class CactusPlot(NotebookExecutor):
     DEFAULT_OUTPUT = "output/statistics/cactus.ipynb"
     INPUT_NOTEBOOK = os.path.join(DIR, "template.ipynb")
+    INPUTS = (Run, ParameterGroup, RunStatistic)
@@ -0,0 +1,161 @@
+from pathlib import Path
+
+import numpy as np
+from peewee import JOIN
+
+from reprobench.core.base import Step
+from reprobench.core.db import ParameterGroup, Run
+from reprobench.executors.db import RunStatistic
+from reprobench.utils import str_to_bool
+
+try:
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+except ImportError:
+    pass
+
+
+def load_solved(measure):
+    """Load the measure of the solved runs of each tool and parameter group
+
+    Returns:
+        dict: for each `<tool>_<group>` label, the sorted measures of its
+        successful runs and its number of finished runs, including the
+        failed ones and those without statistics
+    """
+    field = getattr(RunStatistic, measure)
+    rows = (
+        Run.select(Run.tool, ParameterGroup.name, RunStatistic.verdict, field)
+        .join_from(Run, ParameterGroup)
+        .join_from(Run, RunStatistic, JOIN.LEFT_OUTER)
+        .where(Run.status.in_([Run.DONE, Run.FAILED]))
+        .tuples()
+    )
+    tools, groups, verdicts, values = zip(*rows) if rows.exists() else ([],) * 4
+
+    labels = np.array([f"{tool}_{group}" for tool, group in zip(tools, groups)])
+    values = np.array(values, dtype=float)
+    names, inverse, totals = np.unique(labels, return_inverse=True, return_counts=True)
+
+    solved = (np.array(verdicts) == RunStatistic.SUCCESS) & ~np.isnan(values)
+    # sorted by group, then by value
+    order = np.lexsort((values[solved], inverse[solved]))
+    sorted_values = values[solved][order]
+    bounds = np.searchsorted(inverse[solved][order], np.arange(len(names) + 1))
+
+    return {
+        name: (sorted_values[bounds[i] : bounds[i + 1]], totals[i])
+        for i, name in enumerate(names)
+    }
+
+
+def downsample(x, y, max_points):
+    """Keep at most `max_points` points of a monotonic curve, evenly by rank
+
+    The first and last points are always kept.
+    """
+    if max_points is None or len(x) <= max_points:
+        return x, y
+    keep = np.unique(np.linspace(0, len(x) - 1, max_points).round().astype(int))
+    return x[keep], y[keep]
+
+
+class RuntimeFigure(Step):
+    """Base of the plots of the solved runs of each tool and parameter group
+
+    Config:
+        output (str): image file, relative to the output directory. The
+            format (e.g. SVG, PNG or PDF) follows the extension.
+        measure (str, optional): column of `RunStatistic` to plot. Defaults
+            to "cpu_time".
+        log (bool, optional): logarithmic time axis. Defaults to False.
+        max_points (int, optional): points drawn per curve. Defaults to 1000.
+        width (float, optional): width in inches. Defaults to 8.
+        height (float, optional): height in inches. Defaults to 6.
+        dpi (int, optional): resolution of raster images. Defaults to 150.
+    """
+
+    INPUTS = (Run, ParameterGroup, RunStatistic)
+    DEFAULT_OUTPUT = None
+    DEFAULT_MAX_POINTS = 1000
+
+    @classmethod
+    def get_curve(cls, values, total):
+        """Get the (x, y) points of the curve of a group"""
+        raise NotImplementedError
+
+    @classmethod
+    def decorate(cls, ax, measure, log):
+        raise NotImplementedError
+
+    @classmethod
+    def get_output(cls, config=None):
+        return (config or {}).get("output", cls.DEFAULT_OUTPUT)
+
+    @classmethod
+    def execute(cls, context, config=None):
+        if config is None:
+            config = {}
+
+        output_dir = context.get("output_dir", None)
+        output = Path(output_dir) / cls.get_output(config)
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        # plugin configs are read from the YAML as strings
+        measure = config.get("measure", "cpu_time")
+        log = str_to_bool(config.get("log", False))
+        max_points = int(config.get("max_points", cls.DEFAULT_MAX_POINTS))
+        size = (float(config.get("width", 8)), float(config.get("height", 6)))
+
+        figure = Figure(figsize=size)
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot(1, 1, 1)
+
+        for label, (values, total) in load_solved(measure).items():
+            x, y = downsample(*cls.get_curve(values, total), max_points)
+            ax.step(x, y, where="post", label=label, marker=".", markersize=3)
+
+        cls.decorate(ax, measure, log)
+        ax.grid(True, alpha=0.3)
+        if ax.has_data():
+            ax.legend()
+        figure.tight_layout()
+        figure.savefig(str(output), dpi=int(config.get("dpi", 150)))
+
+
+class CactusFigure(RuntimeFigure):
+    """Cactus plot: the time needed to solve each number of tasks"""
+
+    DEFAULT_OUTPUT = "statistics/cactus.svg"
+
+    @classmethod
+    def get_curve(cls, values, total):
+        return np.arange(1, len(values) + 1), values
+
+    @classmethod
+    def decorate(cls, ax, measure, log):
+        ax.set_xlabel("Tasks solved")
+        ax.set_ylabel(measure)
+        if log:
+            ax.set_yscale("log")
+
+
+class ECDFFigure(RuntimeFigure):
+    """Empirical CDF: the fraction of runs solved within each time
+
+    Unsolved runs count in the total, so curves end at the solved ratio.
+    """
+
+    DEFAULT_OUTPUT = "statistics/ecdf.svg"
+
+    @classmethod
+    def get_curve(cls, values, total):
+        return values, np.arange(1, len(values) + 1) / total
+
+    @classmethod
+    def decorate(cls, ax, measure, log):
+        ax.set_xlabel(measure)
+        ax.set_ylabel("Fraction of runs solved")
+        ax.set_ylim(0, 1.05)
+        if log:
+            ax.set_xscale("log")
@@ -1 +1,3 @@
-from .run import RunTable, RunSummaryTable
+from .run import RunTable, RunSummaryTable, RunTimeSeriesTable
+from .arrow import RunArrowTable
+from .metrics import SolverMetricsTable
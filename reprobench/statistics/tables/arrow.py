@@ -0,0 +1,199 @@
+from pathlib import Path
+from urllib.parse import quote
+
+from peewee import (
+    Alias,
+    BlobField,
+    BooleanField,
+    DateTimeField,
+    FloatField,
+    ForeignKeyField,
+    IntegerField,
+)
+
+from reprobench.core.base import Step
+from reprobench.core.db import Run, Task
+
+from .run import RunTable
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pass
+
+PARTITIONS = {"tool": Run.tool, "task_group": Task.group}
+
+
+def get_arrow_type(field):
+    """Get the Arrow type of the values of a peewee field"""
+    while isinstance(field, ForeignKeyField):
+        field = field.rel_field
+
+    if isinstance(field, BooleanField):
+        return pa.bool_()
+    elif isinstance(field, IntegerField):
+        return pa.int64()
+    elif isinstance(field, FloatField):
+        return pa.float64()
+    elif isinstance(field, DateTimeField):
+        return pa.timestamp("us")
+    elif isinstance(field, BlobField):
+        return pa.binary()
+    return pa.string()
+
+
+def get_columns(query):
+    """Get the name and Arrow type of the columns selected by a query"""
+    columns = []
+    for node in query._returning:
+        if isinstance(node, Alias):
+            columns.append((node._alias, get_arrow_type(node.node)))
+        else:
+            columns.append((node.column_name, get_arrow_type(node)))
+    return columns
+
+
+class PartitionedWriter:
+    """Writer of record batches to a file, or to one file per partition
+
+    Args:
+        output (Path): output file, or directory when partitioned
+        schema (pyarrow.Schema): schema of the batches
+        ipc (bool): write Arrow IPC files instead of Parquet
+        compression (str): compression codec
+        partition_by (str, optional): name of the partitioning column
+    """
+
+    def __init__(self, output, schema, ipc, compression, partition_by=None):
+        self.output = output
+        self.schema = schema
+        self.ipc = ipc
+        self.compression = compression
+        self.partition_by = partition_by
+        self.writers = {}
+
+    def get_path(self, key):
+        if self.partition_by is None:
+            return self.output
+        suffix = ".arrow" if self.ipc else ".parquet"
+        directory = f"{self.partition_by}={quote(str(key), safe='')}"
+        return self.output / directory / f"part-0{suffix}"
+
+    def get_writer(self, key):
+        if key not in self.writers:
+            path = self.get_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if self.ipc:
+                options = pa.ipc.IpcWriteOptions(compression=self.compression)
+                writer = pa.ipc.new_file(str(path), self.schema, options=options)
+            else:
+                writer = pq.ParquetWriter(
+                    str(path), self.schema, compression=self.compression
+                )
+            self.writers[key] = writer
+        return self.writers[key]
+
+    def write(self, key, columns):
+        """Write a chunk of a partition, given as one list per column"""
+        arrays = [
+            pa.array(values, type=field.type)
+            for values, field in zip(columns, self.schema)
+        ]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        self.get_writer(key).write_batch(batch)
+
+    def close(self):
+        if len(self.writers) == 0 and self.partition_by is None:
+            # an empty table still gets its schema written
+            self.get_writer(None)
+        for writer in self.writers.values():
+            writer.close()
+
+
+class RunArrowTable(Step):
+    """Stream the run table into Parquet or Arrow IPC files
+
+    The rows of the query are read and written `chunk_size` at a time, so
+    the table never has to fit in memory. The column types follow the
+    peewee fields, and duplicated columns of the joins are kept once.
+
+    With `partition_by` set to `tool` or `task_group`, one file is written
+    per value in Hive-style directories (`<output>/tool=<tool>/part-0.parquet`),
+    without the partitioning column itself, as read by `pyarrow.dataset` or
+    `pandas.read_parquet`.
+
+    Config:
+        output (str): output file or directory, relative to the output
+            directory. Ending with `.arrow` or `.feather` writes Arrow IPC
+            files, Parquet otherwise.
+        joins (list, optional): models to join, as in `RunTable`
+        chunk_size (int, optional): rows per chunk. Defaults to 100000.
+        compression (str, optional): compression codec. Defaults to "zstd".
+        partition_by (str, optional): "tool" or "task_group"
+    """
+
+    DEFAULT_CHUNK_SIZE = 100000
+    DEFAULT_COMPRESSION = "zstd"
+
+    @classmethod
+    def get_inputs(cls, config=None):
+        inputs = RunTable.get_inputs(config)
+        if (config or {}).get("partition_by") == "task_group":
+            inputs = (*inputs, Task)
+        return inputs
+
+    @classmethod
+    def get_query(cls, config):
+        query = RunTable.get_query(config)
+        partition_by = config.get("partition_by")
+        if partition_by == "task_group":
+            query = query.join_from(Run, Task)
+        if partition_by is not None:
+            query = query.select_extend(PARTITIONS[partition_by].alias(partition_by))
+        return query
+
+    @classmethod
+    def execute(cls, context, config=None):
+        if config is None:
+            config = {}
+
+        output = Path(context.get("output_dir", None)) / config["output"]
+        chunk_size = int(config.get("chunk_size", cls.DEFAULT_CHUNK_SIZE))
+        partition_by = config.get("partition_by")
+
+        query = cls.get_query(config)
+        # columns repeated by the joins (e.g. the run id) are kept once
+        kept = {}
+        for i, (name, arrow_type) in enumerate(get_columns(query)):
+            if name not in kept and name != partition_by:
+                kept[name] = (i, arrow_type)
+        indices = [i for i, _ in kept.values()]
+        schema = pa.schema(
+            [(name, arrow_type) for name, (_, arrow_type) in kept.items()]
+        )
+
+        writer = PartitionedWriter(
+            output,
+            schema,
+            ipc=output.suffix in (".arrow", ".feather"),
+            compression=config.get("compression", cls.DEFAULT_COMPRESSION),
+            partition_by=partition_by,
+        )
+
+        def flush(key, rows):
+            writer.write(key, [[row[i] for row in rows] for i in indices])
+
+        try:
+            chunks = {}
+            for row in query.tuples().iterator():
+                key = row[-1] if partition_by is not None else None
+                chunk = chunks.setdefault(key, [])
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    flush(key, chunks.pop(key))
+
+            for key, rows in chunks.items():
+                flush(key, rows)
+        finally:
+            writer.close()
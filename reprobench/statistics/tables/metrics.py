@@ -0,0 +1,100 @@
+import numpy as np
+
+from reprobench.core.db import Limit, ParameterGroup, Run
+from reprobench.executors.db import RunStatistic
+from reprobench.statistics.metrics import (
+    RuntimeMatrix,
+    bootstrap_ci,
+    marginal_contribution,
+    virtual_best,
+)
+
+from .base import PandasExporter
+
+try:
+    import pandas as pd
+except ImportError:
+    pass
+
+
+class SolverMetricsTable(PandasExporter):
+    """Compare the solvers (tool and parameter group) on the tasks
+
+    For each solver and for the virtual best solver (VBS, the best solver
+    of each task): the number of tasks solved and the PAR-k scores (mean
+    runtime, with `k` times the time limit for unsolved runs), with
+    bootstrapped confidence intervals over the tasks. The marginal
+    contribution of a solver is how much the VBS worsens without it.
+    Failed runs, runs without statistics and timeouts of capped runs count
+    as unsolved.
+
+    Config:
+        output (str): output file, relative to the output directory
+        measure (str, optional): column of `RunStatistic` used as runtime.
+            Defaults to "cpu_time".
+        par (int or list, optional): penalty factors. Defaults to [2, 10].
+        time_limit (float, optional): defaults to the time limit of the
+            benchmark
+        missing (str, optional): "common" to compare on the tasks run by all
+            solvers, "unsolved" to count missing runs as unsolved. Defaults
+            to "common".
+        bootstrap (int, optional): resamples of the tasks, 0 to skip the
+            confidence intervals. Defaults to 1000.
+        confidence (float, optional): confidence level. Defaults to 0.95.
+        seed (int, optional): seed of the resampling. Defaults to 0.
+    """
+
+    INPUTS = (Run, ParameterGroup, RunStatistic, Limit)
+    DEFAULT_PAR = (2, 10)
+    VIRTUAL_BEST = "virtual_best"
+
+    @classmethod
+    def get_time_limit(cls, config):
+        if "time_limit" in config:
+            return float(config["time_limit"])
+        return float(Limit.get(Limit.key == "time").value)
+
+    @classmethod
+    def get_dataframe(cls, config):
+        # plugin configs are read from the YAML as strings
+        measure = config.get("measure", "cpu_time")
+        pars = config.get("par", cls.DEFAULT_PAR)
+        if not isinstance(pars, (list, tuple)):
+            # a single factor, e.g. `par: 10`
+            pars = [pars]
+        pars = [int(k) for k in pars]
+        samples = int(config.get("bootstrap", 1000))
+        confidence = float(config.get("confidence", 0.95))
+        seed = int(config.get("seed", 0))
+        time_limit = cls.get_time_limit(config)
+
+        matrix = RuntimeMatrix.load(measure).restrict(config.get("missing", "common"))
+        if len(matrix.solvers) == 0:
+            # no finished runs yet
+            return pd.DataFrame(index=pd.Index([], name="tool_name"))
+        index = [*matrix.solvers, cls.VIRTUAL_BEST]
+
+        # per-task scores, with the VBS as the last row; the number of tasks
+        # solved is the mean solved rate times the number of tasks
+        rates = matrix.solved_rate()
+        scores = {"solved": np.vstack([rates, -virtual_best(-rates)])}
+        contributions = {"solved": marginal_contribution(-rates)}
+        for k in pars:
+            costs = matrix.par(k, time_limit)
+            scores[f"par{k}"] = np.vstack([costs, virtual_best(costs)])
+            contributions[f"par{k}"] = marginal_contribution(costs)
+
+        tasks = len(matrix.tasks)
+        columns = {"tasks": np.full(len(index), tasks)}
+        for name, values in scores.items():
+            scale = tasks if name == "solved" else 1
+            columns[name] = values.mean(axis=1) * scale if tasks > 0 else np.nan
+            if samples > 0:
+                low, high = bootstrap_ci(values, samples, confidence, seed)
+                columns[f"{name}_low"] = low * scale
+                columns[f"{name}_high"] = high * scale
+        for name, values in contributions.items():
+            scale = tasks if name == "solved" else 1
+            columns[f"marginal_{name}"] = np.append(values * scale, np.nan)
+
+        return pd.DataFrame(columns, index=pd.Index(index, name="tool_name"))
@@ -1,5 +1,6 @@
 from reprobench.core.db import ParameterGroup, Run, db
-from reprobench.executors.db import RunStatistic
+from reprobench.executors.db import RunStatistic, RunTimeSeries
+from reprobench.statistics.timeseries import load_all_timeseries
 from reprobench.utils import import_class
 
 from .base import PandasExporter
@@ -12,7 +13,12 @@ except ImportError:
 
 class RunTable(PandasExporter):
     @classmethod
-    def get_dataframe(cls, config):
+    def get_inputs(cls, config=None):
+        joins = (config or {}).get("joins", [])
+        return (Run, *(import_class(model_class) for model_class in joins))
+
+    @classmethod
+    def get_query(cls, config):
         joins = config.get("joins", [])
         query = Run.select()
 
@@ -22,34 +28,58 @@ class RunTable(PandasExporter):
                 *model._meta.fields.values()
             )
 
-        sql, params = query.sql()
+        return query
+
+    @classmethod
+    def get_dataframe(cls, config):
+        sql, params = cls.get_query(config).sql()
 
         return pd.read_sql_query(sql, db, params=params)
 
 
+class RunTimeSeriesTable(PandasExporter):
+    INPUTS = (RunTimeSeries,)
+
+    @classmethod
+    def get_dataframe(cls, config):
+        return load_all_timeseries(config.get("runs"))
+
+
 class RunSummaryTable(PandasExporter):
+    INPUTS = (Run, ParameterGroup, RunStatistic)
     DEFAULT_COLUMNS = ("cpu_time", "wall_time", "max_memory")
 
     @classmethod
     def get_dataframe(cls, config):
-        columns = config.get("columns", cls.DEFAULT_COLUMNS)
+        columns = list(config.get("columns", cls.DEFAULT_COLUMNS))
         tool_names = [
-            f"{group.tool_id}_{group.name}" for group in ParameterGroup.select()
+            f"{tool}_{name}"
+            for tool, name in ParameterGroup.select(
+                ParameterGroup.tool, ParameterGroup.name
+            ).tuples()
         ]
-        multiindex = pd.MultiIndex.from_product((tool_names, columns))
-        df = pd.DataFrame(index=multiindex).transpose()
-
-        for group in ParameterGroup.select():
-            tool_name = f"{group.tool_id}_{group.name}"
-            query = (
-                RunStatistic.select()
-                .join(Run)
-                .where(Run.tool_id == group.tool_id)
-                .where(Run.parameter_group_id == group.id)
+
+        query = (
+            RunStatistic.select(
+                Run.tool,
+                ParameterGroup.name,
+                *(getattr(RunStatistic, column) for column in columns),
             )
-            sql, params = query.sql()
-            tool_df = pd.read_sql(sql, db, params=params)
-            for col in columns:
-                df.loc(axis=1)[tool_name, col] = tool_df[col]
+            .join(Run)
+            .join(ParameterGroup)
+            .tuples()
+        )
+        df = pd.DataFrame(list(query), columns=["tool", "group", *columns])
+
+        df["tool_name"] = df.pop("tool") + "_" + df.pop("group")
+        # columns of an empty result are not numeric
+        df[columns] = df[columns].astype(float)
+        summary = df.groupby("tool_name")[columns].describe()
+        statistics = summary.columns.get_level_values(1).unique()
 
-        return df.describe()
+        # (tool_name) x (column, statistic) to (statistic) x (tool_name, column)
+        summary = summary.T.unstack(level=0).reindex(statistics)
+        multiindex = pd.MultiIndex.from_product((tool_names, columns))
+        summary = summary.reindex(columns=multiindex)
+        summary.loc["count"] = summary.loc["count"].fillna(0)
+        return summary
@@ -0,0 +1,63 @@
+from reprobench.executors.db import RunTimeSeries
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    pass
+
+
+def _to_dataframe(arrays):
+    samples = np.concatenate(arrays, axis=1).T
+    return pd.DataFrame(samples, columns=RunTimeSeries.COLUMNS)
+
+
+def load_timeseries(run_id):
+    """Load the sampled resource usage of a run
+
+    Args:
+        run_id (str): the run id
+
+    Returns:
+        pandas.DataFrame: one row per sample, with the `RunTimeSeries.COLUMNS`
+        as columns (empty if the run was not sampled)
+    """
+    batches = (
+        RunTimeSeries.select()
+        .where(RunTimeSeries.run == run_id)
+        .order_by(RunTimeSeries.batch)
+    )
+    arrays = [batch.decode() for batch in batches]
+    if len(arrays) == 0:
+        return pd.DataFrame(columns=RunTimeSeries.COLUMNS)
+
+    return _to_dataframe(arrays)
+
+
+def load_all_timeseries(run_ids=None):
+    """Load the sampled resource usage of many runs at once
+
+    Args:
+        run_ids (list, optional): the run ids. Defaults to all sampled runs.
+
+    Returns:
+        pandas.DataFrame: one row per sample, with a `run_id` column in
+        addition to the `RunTimeSeries.COLUMNS`
+    """
+    query = RunTimeSeries.select().order_by(RunTimeSeries.run, RunTimeSeries.batch)
+    if run_ids is not None:
+        query = query.where(RunTimeSeries.run.in_(run_ids))
+
+    frames = {}
+    for batch in query:
+        frames.setdefault(batch.run_id, []).append(batch.decode())
+
+    if len(frames) == 0:
+        return pd.DataFrame(columns=("run_id", *RunTimeSeries.COLUMNS))
+
+    df = pd.concat(
+        [_to_dataframe(arrays) for arrays in frames.values()],
+        keys=list(frames.keys()),
+        names=("run_id", None),
+    )
+    return df.reset_index(level=0).reset_index(drop=True)
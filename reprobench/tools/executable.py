@@ -3,6 +3,7 @@ from pathlib import Path
 from loguru import logger
 
 from reprobench.core.base import Tool
+from reprobench.utils import open_decompressed
 
 
 class ExecutableTool(Tool):
@@ -26,11 +27,23 @@ class ExecutableTool(Tool):
     def get_err_path(self):
         return Path(self.cwd) / "run.err"
 
+    def open_output(self):
+        if self.storage is not None:
+            return self.storage.open(self.cwd, "out")
+        return open_decompressed(self.get_out_path())
+
+    def open_error(self):
+        if self.storage is not None:
+            return self.storage.open(self.cwd, "err")
+        return open_decompressed(self.get_err_path())
+
     def get_output(self):
-        return self.get_out_path().read_bytes()
+        with self.open_output() as f:
+            return f.read()
 
     def get_error(self):
-        return self.get_err_path().read_bytes()
+        with self.open_error() as f:
+            return f.read()
 
     def run(self, executor):
         logger.debug([*self.get_cmdline(), self.task])
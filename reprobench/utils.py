@@ -1,7 +1,12 @@
 """Various utilities"""
 
+import gzip
 import importlib
+import io
+import mmap
+import os
 import re
+import stat
 import tarfile
 import zipfile
 from ast import literal_eval
@@ -25,6 +30,13 @@ except ImportError:
     APSWDatabase = None
     db = None
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+
 
 def find_executable(executable):
     """Find an executable path from its name
@@ -146,6 +158,33 @@ def str_to_range(range_str):
     return range(start, end)
 
 
+def str_to_bool(value):
+    """Parse a boolean of a plugin config, as strictyaml's `Bool` does
+
+    Plugin configs are read from the YAML as strings.
+
+    Args:
+        value (str or bool): The value, e.g. "yes", "on", "1" or "false"
+
+    Returns:
+        bool: The parsed value
+
+    Examples:
+        >>> str_to_bool("Yes")
+        True
+        >>> str_to_bool("off")
+        False
+        >>> str_to_bool(True)
+        True
+    """
+    if isinstance(value, bool):
+        return value
+    text = str(value).lower()
+    if text not in strictyaml.constants.BOOL_VALUES:
+        raise ValueError(f"Expected a boolean, found {value!r}")
+    return text in strictyaml.constants.TRUE_VALUES
+
+
 def encode_message(obj):
     """Encode an object for transport
 
@@ -309,6 +348,208 @@ def extract_archives(path):
         extract_tar(path, extract_path)
 
 
+def tail_file(f, size):
+    """Read the last bytes of a binary file object
+
+    Seekable files are read from the end directly, other streams
+    (e.g. decompressors) are consumed keeping only the last chunk.
+
+    Args:
+        f (file): binary file object opened for reading
+        size (int): maximum number of bytes to return
+
+    Returns:
+        bytes: the last `size` bytes of the file
+    """
+    try:
+        end = f.seek(0, io.SEEK_END)
+        f.seek(max(0, end - size))
+        return f.read()
+    except (OSError, ValueError, io.UnsupportedOperation):
+        pass
+
+    tail = b""
+    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+        tail = (tail + chunk)[-size:]
+    return tail
+
+
+def _is_regular_file(f):
+    # decompressing readers may expose the fileno of the compressed file
+    if not isinstance(getattr(f, "raw", f), io.FileIO):
+        return False
+    try:
+        return stat.S_ISREG(os.fstat(f.fileno()).st_mode)
+    except (OSError, ValueError):
+        return False
+
+
+def search_file(f, pattern, flags=0):
+    """Search a binary file object for a regular expression
+
+    Regular files are memory-mapped so that the pattern is matched
+    against the whole content without reading it into memory. Other
+    streams are searched line by line, in which case a match cannot
+    span multiple lines.
+
+    Args:
+        f (file): binary file object opened for reading
+        pattern (bytes): regular expression to search for
+        flags (int, optional): flags for `re.compile`
+
+    Returns:
+        bytes: the first match, or None if the pattern is not found
+
+    Examples:
+        >>> with open("run.out", "rb") as f:
+        ...     search_file(f, rb"^s (UN)?SATISFIABLE", re.MULTILINE)
+        b's SATISFIABLE'
+    """
+    regex = re.compile(pattern, flags)
+
+    if _is_regular_file(f):
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            match = regex.search(mapped)
+            return bytes(match.group(0)) if match else None
+
+    for line in f:
+        match = regex.search(line)
+        if match:
+            return match.group(0)
+
+    return None
+
+
+def get_compressed_path(path, compression=None):
+    """Get the on-disk path of a file stored with the given compression
+
+    Args:
+        path (str): path of the uncompressed file
+        compression (str, optional): "zstd", "gzip" or None
+
+    Returns:
+        Path: `path` with the suffix of the compression appended
+
+    Examples:
+        >>> get_compressed_path("run.out", "zstd")
+        PosixPath('run.out.zst')
+    """
+    path = Path(path)
+    if compression is None:
+        return path
+    if compression not in COMPRESSION_SUFFIXES:
+        raise NotSupportedError(f"Compression {compression} is not supported")
+    return path.with_name(path.name + COMPRESSION_SUFFIXES[compression])
+
+
+def open_compressed(path, mode="rb", compression=None, level=None):
+    """Open a binary file, compressing or decompressing on the fly
+
+    Args:
+        path (str): path of the file on disk
+        mode (str, optional): either "rb" or "wb". Defaults to "rb".
+        compression (str, optional): "zstd", "gzip" or None for plain files
+        level (int, optional): compression level, only used for writing
+
+    Raises:
+        NotSupportedError: If the compression is unknown or its
+            library is not installed
+
+    Returns:
+        file: binary file object
+    """
+    if compression is None:
+        return open(path, mode)
+
+    if mode == "rb":
+        return decompress_stream(open(path, "rb"), compression)
+
+    if compression == "gzip":
+        return gzip.open(path, mode, compresslevel=level or 6)
+
+    if compression == "zstd":
+        if zstandard is None:
+            raise NotSupportedError("You need to install the `zstd` extra")
+        compressor = zstandard.ZstdCompressor(level=level or 3)
+        return compressor.stream_writer(open(path, mode))
+
+    raise NotSupportedError(f"Compression {compression} is not supported")
+
+
+class ClosingGzipFile(gzip.GzipFile):
+    """Gzip reader that also closes the file object it reads from
+
+    `gzip.GzipFile` only closes the file objects it opened itself.
+    """
+
+    def __init__(self, fileobj):
+        super().__init__(fileobj=fileobj, mode="rb")
+        self.source = fileobj
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.source.close()
+
+
+def decompress_stream(f, compression=None):
+    """Wrap a binary file object to decompress it while reading
+
+    Closing the returned file object also closes `f`.
+
+    Args:
+        f (file): binary file object with the compressed content
+        compression (str, optional): "zstd", "gzip" or None
+
+    Raises:
+        NotSupportedError: If the compression is unknown or its
+            library is not installed
+
+    Returns:
+        file: binary file object of the decompressed content
+    """
+    if compression is None:
+        return f
+
+    if compression == "gzip":
+        return ClosingGzipFile(f)
+
+    if compression == "zstd":
+        if zstandard is None:
+            raise NotSupportedError("You need to install the `zstd` extra")
+        decompressor = zstandard.ZstdDecompressor()
+        return io.BufferedReader(decompressor.stream_reader(f))
+
+    raise NotSupportedError(f"Compression {compression} is not supported")
+
+
+def open_decompressed(path):
+    """Open a file for reading, transparently decompressing it
+
+    Looks for `path` itself first, then for its compressed variants
+    as written by `get_compressed_path`.
+
+    Args:
+        path (str): path of the uncompressed file
+
+    Raises:
+        FileNotFoundError: If neither the file nor a compressed variant exists
+
+    Returns:
+        file: binary file object
+    """
+    for compression in (None, *COMPRESSION_SUFFIXES):
+        candidate = get_compressed_path(path, compression)
+        if candidate.exists():
+            return open_compressed(candidate, "rb", compression)
+
+    raise FileNotFoundError(path)
+
+
 def get_pcs_parameter_range(parameter_str, is_categorical):
     """Generate a range from specified pcs range notation
 
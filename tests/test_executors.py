@@ -0,0 +1,175 @@
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+import strictyaml
+
+from reprobench.core.schema import plugin_schema
+from reprobench.core.worker import exit_on_signal
+from reprobench.executors import RusageExecutor
+from reprobench.executors.db import RunStatistic
+from reprobench.executors.events import STORE_RUNSTATS, STORE_TIMESERIES
+from reprobench.utils import decode_message, get_compressed_path, open_decompressed
+
+
+class Socket:
+    """Socket collecting the events sent by an executor"""
+
+    def __init__(self):
+        self.events = []
+
+    def send_multipart(self, event):
+        event_type, payload = event
+        self.events.append((event_type, decode_message(payload)))
+
+    def get_statistics(self):
+        return next(p for event, p in self.events if event == STORE_RUNSTATS)
+
+
+def load_step(text):
+    """Parse a step as read from a benchmark file, with string values"""
+    return strictyaml.load(text, schema=plugin_schema).data
+
+
+def make_executor(tmp_path, config, executor_class=RusageExecutor, **limits):
+    run = dict(
+        id="run",
+        limits={"time": 10, "memory": 1024, **limits},
+        output_dir=str(tmp_path),
+    )
+    context = dict(socket=Socket(), run=run)
+    return executor_class(context, load_step(config).get("config"))
+
+
+def run_command(executor, tmp_path, cmdline):
+    directory = tmp_path / "run"
+    executor.run(
+        cmdline,
+        out_path=directory / "run.out",
+        err_path=directory / "run.err",
+        directory=directory,
+    )
+    return executor.socket.get_statistics()
+
+
+def test_output_tail_from_yaml(tmp_path):
+    config = """
+module: reprobench.executors.RusageExecutor
+config:
+  output_tail: 0.25
+"""
+    executor = make_executor(tmp_path, config, output=1)
+
+    statistics = run_command(executor, tmp_path, ["sh", "-c", "yes | head -c 2000000"])
+
+    assert statistics["verdict"] == RunStatistic.OUTPUT_LIMIT
+    head, tail = (tmp_path / "run" / "run.out").read_bytes().split(b"truncated]\n")
+    assert len(tail) == 1024 * 1024 // 4
+
+
+def test_output_tail_out_of_range(tmp_path):
+    config = """
+module: reprobench.executors.RusageExecutor
+config:
+  output_tail: 2
+"""
+    with pytest.raises(ValueError):
+        make_executor(tmp_path, config)
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compression_level_from_yaml(tmp_path, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    config = f"""
+module: reprobench.executors.RusageExecutor
+config:
+  compression: {compression}
+  compression_level: 9
+"""
+    executor = make_executor(tmp_path, config)
+
+    statistics = run_command(executor, tmp_path, ["echo", "hello"])
+
+    assert statistics["verdict"] == RunStatistic.SUCCESS
+    out_path = tmp_path / "run" / "run.out"
+    assert get_compressed_path(out_path, compression).exists()
+    with open_decompressed(out_path) as f:
+        assert f.read() == b"hello\n"
+
+
+def test_memout_of_a_single_allocation(tmp_path):
+    config = """
+module: reprobench.executors.RusageExecutor
+config:
+  memout_ratio: 0.9
+"""
+    executor = make_executor(tmp_path, config, memory=256)
+    allocate = "bytearray(1024 ** 3)"
+
+    statistics = run_command(executor, tmp_path, ["python3", "-S", "-c", allocate])
+
+    assert statistics["verdict"] == RunStatistic.MEMOUT
+    assert statistics["max_memory"] * 1024 < 0.9 * executor.mem_limit
+
+
+def test_runtime_error_is_not_memout(tmp_path):
+    executor = make_executor(tmp_path, "module: reprobench.executors.RusageExecutor")
+
+    statistics = run_command(executor, tmp_path, ["sh", "-c", "exit 3"])
+
+    assert statistics["verdict"] == RunStatistic.RUNTIME_ERR
+
+
+def test_sampling_from_yaml(tmp_path):
+    pytest.importorskip("psutil")
+    config = """
+module: reprobench.executors.RusageExecutor
+config:
+  sample_interval: 0.05
+  sample_batch: 2
+"""
+    executor = make_executor(tmp_path, config)
+
+    run_command(executor, tmp_path, ["sleep", "0.5"])
+
+    batches = [p for event, p in executor.socket.events if event == STORE_TIMESERIES]
+    assert len(batches) > 1
+    assert all(batch["samples"] <= 2 for batch in batches)
+
+
+def is_running(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def run_until_terminated(tmp_path, cmdline):
+    signal.signal(signal.SIGTERM, exit_on_signal)
+    executor = make_executor(tmp_path, "module: reprobench.executors.RusageExecutor")
+    run_command(executor, tmp_path, cmdline)
+
+
+def test_terminated_worker_kills_the_tool(tmp_path):
+    pid_path = tmp_path / "tool.pid"
+    cmdline = ["sh", "-c", f"echo $$ > {pid_path}; exec sleep 60"]
+    worker = multiprocessing.get_context("fork").Process(
+        target=run_until_terminated, args=(tmp_path, cmdline)
+    )
+    worker.start()
+    while not pid_path.exists() or not pid_path.read_text().strip():
+        time.sleep(0.05)
+    tool = int(pid_path.read_text())
+
+    os.kill(worker.pid, signal.SIGTERM)
+    worker.join(10)
+
+    assert worker.exitcode == 128 + signal.SIGTERM
+    deadline = time.monotonic() + 5
+    while is_running(tool) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not is_running(tool)
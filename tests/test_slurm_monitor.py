@@ -0,0 +1,208 @@
+import os
+import stat
+
+import pytest
+
+from reprobench.core.db import (
+    MODELS,
+    ParameterGroup,
+    Run,
+    RunJob,
+    Task,
+    TaskGroup,
+    Tool,
+    db,
+)
+from reprobench.core.events import RUN_INTERRUPT
+from reprobench.core.observers import CoreObserver
+from reprobench.managers.slurm import monitor
+from reprobench.managers.slurm.manager import SlurmManager
+from reprobench.managers.slurm.monitor import SlurmMonitor
+from reprobench.managers.slurm.utils import get_job_states
+from reprobench.utils import encode_message, init_db
+
+SACCT = """#!/bin/sh
+printf '%s\n' "$*" >> "{root}/sacct.log"
+cat "{root}/states"
+"""
+
+SBATCH = """#!/bin/sh
+n=$(cat "{root}/next")
+echo $((n + 1)) > "{root}/next"
+printf '%s\n' "$*" >> "{root}/sbatch.log"
+echo "$n;cluster"
+"""
+
+
+class FakeSlurm:
+    """`sacct` printing the job states set by the test, `sbatch` logging jobs"""
+
+    def __init__(self, root):
+        self.root = root
+        for name, script in (("sacct", SACCT), ("sbatch", SBATCH)):
+            path = root / name
+            path.write_text(script.format(root=root))
+            path.chmod(path.stat().st_mode | stat.S_IEXEC)
+        (root / "next").write_text("200")
+        self.set_states({})
+
+    def set_states(self, states):
+        lines = [f"{job_id}|{state}\n" for job_id, state in states.items()]
+        (self.root / "states").write_text("".join(lines))
+
+    @property
+    def submissions(self):
+        log = self.root / "sbatch.log"
+        return log.read_text().splitlines() if log.exists() else []
+
+
+class ServerSocket:
+    """Socket handing the events of the monitor to the core observer"""
+
+    def send(self, event_type, payload):
+        self.reply = None
+        if event_type == monitor.RUN_RECONCILE:
+            self.reply = CoreObserver.reconcile_runs(**payload)
+
+    def recv(self):
+        return encode_message(self.reply)
+
+
+@pytest.fixture
+def fake_slurm(tmp_path, monkeypatch):
+    root = tmp_path / "bin"
+    root.mkdir()
+    monkeypatch.setenv("PATH", f"{root}{os.pathsep}{os.environ['PATH']}")
+    return FakeSlurm(root)
+
+
+@pytest.fixture
+def runs(tmp_path, monkeypatch):
+    """Runs r0-r1 done, r2-r3 running in job 100, r4 submitted and r5 pending"""
+    init_db(str(tmp_path / "benchmark.db"))
+    db.create_tables(MODELS)
+    monkeypatch.setattr(CoreObserver, "interrupted", 0)
+
+    Tool.create(module="tools.Tool", name="tool")
+    TaskGroup.create(name="tasks")
+    group = ParameterGroup.create(name="default", tool="tool")
+    statuses = [Run.DONE, Run.DONE, Run.RUNNING, Run.RUNNING, Run.SUBMITTED]
+    for i, status in enumerate([*statuses, Run.PENDING]):
+        Task.create(group="tasks", path=f"task{i}")
+        Run.create(
+            id=f"r{i}",
+            tool="tool",
+            parameter_group=group,
+            task=f"task{i}",
+            status=status,
+        )
+    RunJob.create(run="r2", job_id="100_1")
+    RunJob.create(run="r3", job_id="100_2")
+
+    yield
+    db.close()
+
+
+@pytest.fixture
+def slurm_monitor(fake_slurm, runs, monkeypatch):
+    socket = ServerSocket()
+    monkeypatch.setattr(monitor, "send_event", lambda _, *event: socket.send(*event))
+
+    manager = SlurmManager.__new__(SlurmManager)
+    manager.config = dict(title="test", limits=dict(time=60, memory=1024, cores=1))
+    manager.output_dir = "output"
+    manager.worker_cmd = "reprobench worker"
+    manager.runs_per_task = 1
+    manager.exclusive_nodes = 0
+    manager.cpu_count = 1
+    manager.run_time = 60
+    manager.socket = socket
+    manager.jobs = ["100"]
+    return SlurmMonitor(manager, poll_interval=0, max_resubmits=2)
+
+
+def test_get_job_states(fake_slurm):
+    fake_slurm.set_states(
+        {"100_1": "TIMEOUT", "100_2": "CANCELLED by 1000", "100_[3-4]": ""}
+    )
+
+    states = get_job_states(["100", "101"])
+
+    assert states == {"100_1": "TIMEOUT", "100_2": "CANCELLED", "100_[3-4]": "PENDING"}
+    # all jobs are polled in a single call
+    assert (fake_slurm.root / "sacct.log").read_text().count("\n") == 1
+    assert "-j 100,101" in (fake_slurm.root / "sacct.log").read_text()
+
+
+def test_resubmits_runs_of_failed_jobs(fake_slurm, slurm_monitor):
+    fake_slurm.set_states({"100_1": "TIMEOUT", "100_2": "RUNNING"})
+
+    result = slurm_monitor.poll()
+
+    assert result["reset"] == 1
+    assert Run.get_by_id("r2").status == Run.PENDING
+    assert Run.get_by_id("r3").status == Run.RUNNING
+    assert len(fake_slurm.submissions) == 1
+    assert "--array=1-1" in fake_slurm.submissions[0]
+    assert slurm_monitor.manager.jobs == ["100", "200"]
+
+    # a job is only reconciled once
+    assert slurm_monitor.poll()["reset"] == 0
+    assert len(fake_slurm.submissions) == 1
+
+
+def test_resubmits_handed_back_runs(fake_slurm, slurm_monitor):
+    fake_slurm.set_states({"100_1": "RUNNING", "100_2": "RUNNING"})
+    CoreObserver.handle_event(
+        RUN_INTERRUPT, "r3", reply=None, address=None, observe_args=None
+    )
+
+    result = slurm_monitor.poll()
+
+    assert result["interrupted"] == 1
+    assert len(fake_slurm.submissions) == 1
+
+
+def test_gives_up_after_max_resubmits(fake_slurm, slurm_monitor):
+    slurm_monitor.resubmits = slurm_monitor.max_resubmits
+    fake_slurm.set_states({"100_1": "FAILED", "100_2": "COMPLETED"})
+    Run.update(status=Run.PENDING).where(Run.id.in_(["r3", "r4"])).execute()
+
+    result = slurm_monitor.poll()
+
+    assert fake_slurm.submissions == []
+    assert result["pending"] == 0
+
+
+def test_handed_back_runs_do_not_use_resubmits(fake_slurm, slurm_monitor):
+    slurm_monitor.resubmits = slurm_monitor.max_resubmits
+    fake_slurm.set_states({"100_1": "RUNNING", "100_2": "RUNNING"})
+    CoreObserver.handle_event(
+        RUN_INTERRUPT, "r3", reply=None, address=None, observe_args=None
+    )
+
+    slurm_monitor.poll()
+
+    assert len(fake_slurm.submissions) == 1
+    assert slurm_monitor.resubmits == slurm_monitor.max_resubmits
+
+
+def test_failed_jobs_use_resubmits(fake_slurm, slurm_monitor):
+    fake_slurm.set_states({"100_1": "FAILED", "100_2": "RUNNING"})
+
+    slurm_monitor.poll()
+
+    assert slurm_monitor.resubmits == 1
+
+
+@pytest.mark.parametrize(
+    "runs, slots, nodes", [(2, 4, 1), (9, 4, 3), (100, 4, 4), (2, None, 2)]
+)
+def test_exclusive_jobs_sized_from_runs(slurm_monitor, runs, slots, nodes):
+    manager = slurm_monitor.manager
+    manager.exclusive_nodes = 4
+    manager.slots_per_node = slots
+
+    submit_args = manager.get_exclusive_submit_args("reprobench worker", runs)
+
+    assert f"--array=1-{nodes}" in submit_args